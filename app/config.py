@@ -33,6 +33,9 @@ class Settings(BaseSettings):
 
     # API Key Cache
     API_KEY_CACHE_TTL: int = 60  # seconds
+    API_KEY_LOCAL_CACHE_TTL: int = 10  # seconds; in-process, per worker (0 disables)
+    API_KEY_LOCAL_CACHE_NEGATIVE_TTL: int = 5  # seconds; unknown keys
+    API_KEY_LOCAL_CACHE_SIZE: int = 10_000
 
     # Budget
     BUDGET_RESERVATION_TTL: int = 300  # seconds
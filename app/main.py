@@ -7,10 +7,12 @@ from __future__ import annotations
 import asyncio
 from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Any
 
+import orjson
 import structlog
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from app.config import get_settings
@@ -117,6 +119,23 @@ async def lifespan(app: FastAPI):
     logger.info("gateway_stopped")
 
 
+class _ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson.
+
+    FastAPI has already run ``jsonable_encoder`` on route return values, so
+    the content is plain JSON-compatible data by the time it gets here
+    (dict keys may still be ints, hence ``OPT_NON_STR_KEYS``, as in the
+    stdlib ``JSONResponse``).
+
+    Routes with a ``response_model`` lose FastAPI's Pydantic ``dump_json``
+    fast path under a custom default class; they are low-traffic
+    management endpoints, while the hot routes return plain dicts.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
 def create_app() -> FastAPI:
     """Create and configure the FastAPI application."""
     settings = get_settings()
@@ -126,6 +145,7 @@ def create_app() -> FastAPI:
         version="2.3.0",
         description="Enterprise-grade LLM Gateway with authentication, budgeting, and load balancing",
         lifespan=lifespan,
+        default_response_class=_ORJSONResponse,
     )
 
     # Middleware
@@ -12,12 +12,13 @@ Order:
 
 from __future__ import annotations
 
-import json
+import asyncio
 import time
 import uuid
 from datetime import datetime
 from typing import Optional
 
+import orjson
 import structlog
 from fastapi import HTTPException, Request, Response
 from fastapi.responses import JSONResponse
@@ -215,6 +216,28 @@ class GatewayMiddleware(BaseHTTPMiddleware):
 # ── Helper functions ─────────────────────────────────────────────
 
 
+# Raw (lower-cased, per ASGI) names of the headers _authenticate consumes.
+_H_AUTH = b"authorization"
+_H_USER = b"x-user-oid"
+_H_APP = b"x-app-id"
+_H_SECRET = b"x-gateway-secret"
+_AUTH_HEADER_NAMES = frozenset((_H_AUTH, _H_USER, _H_APP, _H_SECRET))
+
+
+def _read_auth_headers(request: Request) -> dict[bytes, str]:
+    """
+    Collect the auth-related headers in one pass over ``scope["headers"]``.
+
+    Avoids a case-folding linear scan of Starlette's ``Headers`` per
+    lookup. Like ``Headers.get``, the first occurrence of a name wins.
+    """
+    found: dict[bytes, str] = {}
+    for name, value in request.scope["headers"]:
+        if name in _AUTH_HEADER_NAMES and name not in found:
+            found[name] = value.decode("latin-1")
+    return found
+
+
 async def _authenticate(
     request: Request,
 ) -> tuple[str, Optional[str], Optional[ApiKey], Optional[str]]:
@@ -230,32 +253,29 @@ async def _authenticate(
                                    supplying only one triggers 401.
     """
     settings = get_settings()
+    headers = _read_auth_headers(request)
 
     # Route 1: Web App (Shared Secret)
-    gateway_secret = request.headers.get("X-Gateway-Secret")
+    gateway_secret = headers.get(_H_SECRET)
     if gateway_secret:
         if gateway_secret != settings.GATEWAY_SHARED_SECRET:
             raise HTTPException(401, "Invalid gateway secret")
-        user_oid = request.headers.get("X-User-Oid")
+        user_oid = headers.get(_H_USER)
         if not user_oid:
             raise HTTPException(401, "Missing X-User-Oid header")
         
         # App ID is REQUIRED for Shared Secret auth
-        app_id = request.headers.get("X-App-Id")
+        app_id = headers.get(_H_APP)
         if not app_id:
             raise HTTPException(401, "Missing X-App-Id header (required for web app access)")
         # Validate app exists and is active
-        row = await db.fetch_one("SELECT is_active FROM Apps WHERE app_id = $1", app_id)
-        if not row:
-            raise HTTPException(401, f"Invalid App ID: {app_id}")
-        if not row["is_active"]:
-            raise HTTPException(403, f"App is disabled: {app_id}")
+        await _check_app_active(app_id)
             
         return user_oid, None, None, app_id
 
 
     # Route 2: API Key
-    auth_header = request.headers.get("Authorization")
+    auth_header = headers.get(_H_AUTH)
     if auth_header:
         if not auth_header.startswith("Bearer "):
             raise HTTPException(401, "Invalid Authorization header format")
@@ -317,16 +337,18 @@ async def _authenticate(
             request.query_params.get("x_user_oid")
             or body_user_oid
             or msg_user_oid
-            or request.headers.get("X-User-Oid")
+            or headers.get(_H_USER)
         )
         delegated_app = (
             request.query_params.get("x_app_id")
             or body_app_id
             or msg_app_id
-            or request.headers.get("X-App-Id")
+            or headers.get(_H_APP)
         )
 
-        if delegated_user or delegated_app:
+        # Dispatch on which of user / app were supplied; see _DELEGATION_HANDLERS
+        mask = (bool(delegated_user) << 1) | bool(delegated_app)
+        if mask:
             # Determine which source supplied the delegation
             _src = (
                 "query_param" if request.query_params.get("x_user_oid") or request.query_params.get("x_app_id")
@@ -340,33 +362,92 @@ async def _authenticate(
                 delegated_user=delegated_user,
                 delegated_app=delegated_app,
             )
-            # Both must be supplied together
-            if not delegated_user:
-                raise HTTPException(
-                    401, "Missing user identifier (X-User-Oid header or x_user_oid query param required when app is specified)"
-                )
-            if not delegated_app:
-                raise HTTPException(
-                    401, "Missing app identifier (X-App-Id header or x_app_id query param required when user is specified)"
-                )
+        return await _DELEGATION_HANDLERS[mask](api_key, delegated_user, delegated_app)
 
-            # Validate app exists and is active
-            app_row = await db.fetch_one(
-                "SELECT is_active FROM Apps WHERE app_id = $1", delegated_app
-            )
-            if not app_row:
-                raise HTTPException(401, f"Invalid App ID: {delegated_app}")
-            if not app_row["is_active"]:
-                raise HTTPException(403, f"App is disabled: {delegated_app}")
+    raise HTTPException(401, "No authentication provided")
 
-            # Return delegated user_oid for billing;
-            # API key object is still used for rate limiting / budget / model permissions.
-            return delegated_user, str(api_key.id), api_key, delegated_app
 
-        return api_key.user_oid, str(api_key.id), api_key, None
 
-    raise HTTPException(401, "No authentication provided")
+# app_id -> (expires_at on the monotonic clock, is_active).
+# Only registered apps are cached, so the size is bounded by the Apps table.
+_APP_STATUS_CACHE: dict[str, tuple[float, bool]] = {}
+_APP_STATUS_CACHE_TTL = 30.0  # seconds
+
+
+async def _check_app_active(app_id: str) -> None:
+    """
+    Raise 401 if ``app_id`` is not registered, 403 if it is disabled.
+
+    The ``is_active`` flag is cached in-process for ``_APP_STATUS_CACHE_TTL``
+    seconds so warm apps skip the DB round-trip on every request.
+    """
+    now = time.monotonic()
+    cached = _APP_STATUS_CACHE.get(app_id)
+    if cached and cached[0] > now:
+        is_active = cached[1]
+    else:
+        row = await db.fetch_one("SELECT is_active FROM Apps WHERE app_id = $1", app_id)
+        if not row:
+            raise HTTPException(401, f"Invalid App ID: {app_id}")
+        is_active = row["is_active"]
+        _APP_STATUS_CACHE[app_id] = (now + _APP_STATUS_CACHE_TTL, is_active)
+
+    if not is_active:
+        raise HTTPException(403, f"App is disabled: {app_id}")
+
+
+def invalidate_app_status_cache(app_id: Optional[str] = None) -> None:
+    """Drop a cached app status (or all of them when ``app_id`` is None)."""
+    if app_id is None:
+        _APP_STATUS_CACHE.clear()
+    else:
+        _APP_STATUS_CACHE.pop(app_id, None)
+
+
+async def _bill_key_owner(
+    api_key: ApiKey, delegated_user: Optional[str], delegated_app: Optional[str]
+) -> tuple[str, Optional[str], Optional[ApiKey], Optional[str]]:
+    """No delegation → bill the API key owner."""
+    return api_key.user_oid, str(api_key.id), api_key, None
+
+
+async def _reject_missing_delegated_user(
+    api_key: ApiKey, delegated_user: Optional[str], delegated_app: Optional[str]
+) -> tuple[str, Optional[str], Optional[ApiKey], Optional[str]]:
+    """App given without user — both must be supplied together."""
+    raise HTTPException(
+        401, "Missing user identifier (X-User-Oid header or x_user_oid query param required when app is specified)"
+    )
+
+
+async def _reject_missing_delegated_app(
+    api_key: ApiKey, delegated_user: Optional[str], delegated_app: Optional[str]
+) -> tuple[str, Optional[str], Optional[ApiKey], Optional[str]]:
+    """User given without app — both must be supplied together."""
+    raise HTTPException(
+        401, "Missing app identifier (X-App-Id header or x_app_id query param required when user is specified)"
+    )
+
+
+async def _bill_delegated_user(
+    api_key: ApiKey, delegated_user: Optional[str], delegated_app: Optional[str]
+) -> tuple[str, Optional[str], Optional[ApiKey], Optional[str]]:
+    """User + app given → validate the app and bill the delegated user."""
+    # Validate app exists and is active
+    await _check_app_active(delegated_app)
 
+    # Return delegated user_oid for billing;
+    # API key object is still used for rate limiting / budget / model permissions.
+    return delegated_user, str(api_key.id), api_key, delegated_app
+
+
+# Indexed by ``(bool(delegated_user) << 1) | bool(delegated_app)``.
+_DELEGATION_HANDLERS = (
+    _bill_key_owner,                 # 0b00: neither
+    _reject_missing_delegated_user,  # 0b01: app only
+    _reject_missing_delegated_app,   # 0b10: user only
+    _bill_delegated_user,            # 0b11: both
+)
 
 
 async def _validate_user(user_oid: str) -> None:
@@ -406,13 +487,61 @@ async def _check_rate_limit(api_key: ApiKey) -> None:
         )
 
 
+class _ModelLoader:
+    """
+    Coalesce concurrent model lookups into one ``id = ANY($1)`` query.
+
+    Lookups issued within the same event-loop tick (e.g. a burst of
+    requests) share a single round-trip, and duplicate ids share one
+    future. Nothing is cached between batches.
+    """
+
+    def __init__(self) -> None:
+        self._pending: dict[str, asyncio.Future] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def load(self, model_id: str) -> Optional[dict]:
+        fut = self._pending.get(model_id)
+        if fut is None:
+            loop = asyncio.get_running_loop()
+            if not self._pending:
+                loop.call_soon(self._dispatch)
+            fut = self._pending[model_id] = loop.create_future()
+        # Shielded so one cancelled request doesn't cancel the shared result
+        return await asyncio.shield(fut)
+
+    def _dispatch(self) -> None:
+        batch, self._pending = self._pending, {}
+        task = asyncio.ensure_future(self._load_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    async def _load_batch(batch: dict[str, asyncio.Future]) -> None:
+        try:
+            rows = await db.fetch_all(
+                "SELECT * FROM Models WHERE id = ANY($1::text[]) AND is_active = TRUE",
+                list(batch),
+            )
+        except Exception as exc:
+            for fut in batch.values():
+                if not fut.done():
+                    fut.set_exception(exc)
+            return
+        by_id = {row["id"]: row for row in rows}
+        for model_id, fut in batch.items():
+            if not fut.done():
+                fut.set_result(by_id.get(model_id))
+
+
+_model_loader = _ModelLoader()
+
+
 async def _get_and_check_model(
     model_id: str, api_key: Optional[ApiKey]
 ) -> ModelConfig:
     """Load model config and check permissions."""
-    row = await db.fetch_one(
-        "SELECT * FROM Models WHERE id = $1 AND is_active = TRUE", model_id
-    )
+    row = await _model_loader.load(model_id)
     if not row:
         raise HTTPException(404, f"Model '{model_id}' not found or inactive")
 
@@ -446,11 +575,16 @@ def _try_parse_delegation_json(text: str) -> dict | None:
     """
     stripped = text.strip()
 
+    # Only delegation payloads are worth decoding; ordinary user messages
+    # (including ones that happen to be JSON) skip the parse entirely.
+    if "x_user_oid" not in stripped or "x_app_id" not in stripped:
+        return None
+
     # Fast path: already looks like a JSON object
     if stripped.startswith("{") and stripped.endswith("}"):
         try:
-            parsed = json.loads(stripped)
-        except (json.JSONDecodeError, TypeError):
+            parsed = orjson.loads(stripped)
+        except (orjson.JSONDecodeError, TypeError):
             parsed = None
         if (
             isinstance(parsed, dict)
@@ -461,22 +595,21 @@ def _try_parse_delegation_json(text: str) -> dict | None:
 
     # Fallback: bare key-value pairs without outer braces
     # e.g.  "x_user_oid": "test2", "x_app_id": "dify-prod", "message": "hello"
-    if "x_user_oid" in stripped and "x_app_id" in stripped:
-        wrapped = "{" + stripped + "}"
-        try:
-            parsed = json.loads(wrapped)
-        except (json.JSONDecodeError, TypeError):
-            return None
-        if (
-            isinstance(parsed, dict)
-            and "x_user_oid" in parsed
-            and "x_app_id" in parsed
-        ):
-            logger.debug(
-                "delegation_json_auto_wrapped",
-                original=stripped[:120],
-            )
-            return parsed
+    wrapped = "{" + stripped + "}"
+    try:
+        parsed = orjson.loads(wrapped)
+    except (orjson.JSONDecodeError, TypeError):
+        return None
+    if (
+        isinstance(parsed, dict)
+        and "x_user_oid" in parsed
+        and "x_app_id" in parsed
+    ):
+        logger.debug(
+            "delegation_json_auto_wrapped",
+            original=stripped[:120],
+        )
+        return parsed
 
     return None
 
@@ -10,7 +10,7 @@ from decimal import Decimal
 from typing import Any, Optional
 from uuid import UUID
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
 
 
 # ── Database row models ──────────────────────────────────────────
@@ -187,6 +187,8 @@ class ImageUrl(BaseModel):
     url: str
     detail: Optional[str] = None  # "auto", "low", "high"
 
+    model_config = {"defer_build": True}
+
 
 class ContentPart(BaseModel):
     """
@@ -200,6 +202,8 @@ class ContentPart(BaseModel):
     text: Optional[str] = None
     image_url: Optional[ImageUrl] = None
 
+    model_config = {"defer_build": True}
+
 
 class ChatMessage(BaseModel):
     """
@@ -213,14 +217,21 @@ class ChatMessage(BaseModel):
     content: str | list[ContentPart]
     name: Optional[str] = None
 
+    # Joined text of multimodal content, computed on first use
+    _text_content: Optional[str] = PrivateAttr(default=None)
+
+    model_config = {"defer_build": True}
+
     def get_text_content(self) -> str:
         """Extract only the text portions from content (works for both str and multimodal)."""
         if isinstance(self.content, str):
             return self.content
-        return "\n".join(
-            part.text for part in self.content
-            if part.type == "text" and part.text
-        )
+        if self._text_content is None:
+            self._text_content = "\n".join(
+                part.text for part in self.content
+                if part.type == "text" and part.text
+            )
+        return self._text_content
 
     def has_vision_content(self) -> bool:
         """Return True if this message contains image_url parts."""
@@ -240,6 +251,8 @@ class ChatCompletionRequest(BaseModel):
     stream: bool = False
     stop: Optional[list[str] | str] = None
 
+    model_config = {"defer_build": True}
+
 
 class EmbeddingRequest(BaseModel):
     """OpenAI-compatible embedding request."""
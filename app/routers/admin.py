@@ -23,7 +23,9 @@ from pydantic import BaseModel, Field
 
 from app import database as db
 from app.config import SYSTEM_ADMIN_OID, get_settings
-from app.services.api_key import generate_api_key
+from app.middleware.gateway import invalidate_app_status_cache
+from app.routers.chat import invalidate_models_list_cache
+from app.services.api_key import generate_api_key, invalidate_local_api_key_cache
 from app.services.health_check import check_endpoint_health
 from app.services.usage_log import log_audit
 from app.services.user_management import bulk_sync_expired_users
@@ -442,6 +444,7 @@ async def delete_user(oid: str, request: Request, force: bool = False):
     # force=true: clean up blocking references before deleting
     if has_blockers and force:
         await db.execute("DELETE FROM Apps WHERE owner_id = $1", oid)
+        invalidate_app_status_cache()
         await db.execute("DELETE FROM UsageLogs WHERE user_oid = $1", oid)
         await db.execute("DELETE FROM AuditLogs WHERE admin_oid = $1", oid)
         logger.info(
@@ -465,6 +468,7 @@ async def delete_user(oid: str, request: Request, force: bool = False):
 
     if result == "DELETE 0":
         raise HTTPException(404, "User not found")
+    invalidate_local_api_key_cache()  # the user's ApiKeys went with it
 
     logger.info("delete_user_success", user_oid=oid, email=user.get("email"), force=force)
     await log_audit(
@@ -602,6 +606,7 @@ async def deactivate_api_key(key_id: str):
     )
     if result == "UPDATE 0":
         raise HTTPException(404, "API key not found")
+    invalidate_local_api_key_cache(key_id)
     return {"status": "deactivated"}
 
 
@@ -641,7 +646,8 @@ async def delete_api_key(key_id: UUID):
     if result == "DELETE 0":
         # This should theoretically not happen if probe succeeded, unless race condition or transaction weirdness
         raise HTTPException(500, "Failed to delete key although it exists")
-        
+
+    invalidate_local_api_key_cache(str(target_uuid))
     return {"status": "deleted"}
 
 
@@ -723,6 +729,7 @@ async def create_model(body: ModelCreate):
         body.supports_vision,
         body.description,
     )
+    invalidate_models_list_cache()
     return {"status": "created"}
 
 
@@ -753,6 +760,7 @@ async def update_model(model_id: str, body: ModelUpdate):
     result = await db.execute(query, *args)
     if result == "UPDATE 0":
         raise HTTPException(404, "Model not found")
+    invalidate_models_list_cache()
     return {"status": "updated"}
 
 
@@ -764,6 +772,7 @@ async def toggle_model(model_id: str):
     )
     if result == "UPDATE 0":
         raise HTTPException(404, "Model not found")
+    invalidate_models_list_cache()
     row = await db.fetch_one("SELECT is_active FROM Models WHERE id = $1", model_id)
     return {"status": "toggled", "is_active": row["is_active"] if row else None}
 
@@ -795,6 +804,7 @@ async def delete_model(model_id: str):
         # Should be covered by initial check, but safety net
         raise HTTPException(404, "Model not found (concurrent delete?)")
 
+    invalidate_models_list_cache()
     return {"status": "deleted", "id": model_id}
 
 
@@ -7,6 +7,7 @@ from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import JSONResponse
 
 from app import database as db
+from app.middleware.gateway import invalidate_app_status_cache
 from app.models.schemas import App, AppCreate
 from app.routers.admin import require_admin
 
@@ -65,6 +66,7 @@ async def delete_app(app_id: str):
     result = await db.execute("DELETE FROM Apps WHERE app_id = $1", app_id)
     if result == "DELETE 0":
         raise HTTPException(404, "App not found")
+    invalidate_app_status_cache(app_id)
     
     logger.info("app_deleted", app_id=app_id)
     return {"status": "deleted"}
@@ -79,6 +81,7 @@ async def toggle_app(app_id: str):
     )
     if result == "UPDATE 0":
         raise HTTPException(404, "App not found")
+    invalidate_app_status_cache(app_id)
         
     row = await db.fetch_one("SELECT is_active FROM Apps WHERE app_id = $1", app_id)
     row = await db.fetch_one("SELECT is_active FROM Apps WHERE app_id = $1", app_id)
@@ -35,6 +35,17 @@ router = APIRouter(prefix="/v1", tags=["chat"])
 
 # ── Models listing (OpenAI-compatible) ───────────────────────────
 
+# (expires_at on the monotonic clock, response body) for GET /v1/models.
+# Admin model CRUD clears it via invalidate_models_list_cache.
+_MODELS_LIST_CACHE: Optional[tuple[float, dict[str, Any]]] = None
+_MODELS_LIST_CACHE_TTL = 60.0  # seconds
+
+
+def invalidate_models_list_cache() -> None:
+    """Drop the cached /v1/models response."""
+    global _MODELS_LIST_CACHE
+    _MODELS_LIST_CACHE = None
+
 
 @router.get("/models")
 async def list_models(request: Request):
@@ -43,7 +54,13 @@ async def list_models(request: Request):
 
     Returns all active models. Required by Dify and other
     OpenAI-compatible clients for model discovery / credential validation.
+    The response is cached in-process for ``_MODELS_LIST_CACHE_TTL`` seconds.
     """
+    global _MODELS_LIST_CACHE
+    now = time.monotonic()
+    if _MODELS_LIST_CACHE and _MODELS_LIST_CACHE[0] > now:
+        return _MODELS_LIST_CACHE[1]
+
     rows = await db.fetch_all(
         "SELECT id, provider, created_at FROM Models WHERE is_active = TRUE ORDER BY id"
     )
@@ -58,7 +75,9 @@ async def list_models(request: Request):
             "created": created,
             "owned_by": row["provider"],
         })
-    return {"object": "list", "data": data}
+    body = {"object": "list", "data": data}
+    _MODELS_LIST_CACHE = (now + _MODELS_LIST_CACHE_TTL, body)
+    return body
 
 
 @router.get("/models/{model_id}")
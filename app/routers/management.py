@@ -22,7 +22,7 @@ from app.models.schemas import (
     PerformanceMetrics,
 )
 from app.redis_client import get_redis
-from app.services.api_key import generate_api_key
+from app.services.api_key import generate_api_key, invalidate_local_api_key_cache
 from app.services.usage_log import log_audit
 
 logger = structlog.get_logger(__name__)
@@ -101,6 +101,7 @@ async def rotate_api_key(key_id: str, body: ApiKeyRotateRequest, request: Reques
             new_key_id,
             key_id,
         )
+    invalidate_local_api_key_cache(key_id)  # forget the old key id
 
     # Audit log
     await log_audit(
@@ -8,6 +8,7 @@ from __future__ import annotations
 
 import hashlib
 import secrets
+import time
 from datetime import datetime
 from typing import Optional
 from uuid import UUID
@@ -15,6 +16,7 @@ from uuid import UUID
 import structlog
 
 from app import database as db
+from app.config import get_settings
 from app.models.schemas import ApiKey
 from app.redis_client import get_redis
 
@@ -57,19 +59,89 @@ def verify_api_key_fast(plaintext_key: str, hashed_key: str, salt: str) -> bool:
     return secrets.compare_digest(computed_hash, hashed_key)
 
 
+# ── In-Process Cache ─────────────────────────────────────────────
+# sha256(plaintext) -> (expires_at on the monotonic clock, api key id or None).
+# Sits in front of Redis so a hot key skips the Redis GET; like the Redis
+# cache it only remembers *which* key matched, and the row itself is always
+# re-read from the DB so budget / is_active / allowlists are never stale.
+# Unknown keys are cached as None briefly to absorb retry storms.
+_LOCAL_CACHE: dict[bytes, tuple[float, Optional[str]]] = {}
+
+
+def _local_cache_key(plaintext_key: str) -> bytes:
+    # Digest rather than the key itself, so plaintext keys aren't kept in memory
+    return hashlib.sha256(plaintext_key.encode("utf-8")).digest()
+
+
+def _is_usable(api_key: Optional[ApiKey]) -> bool:
+    return bool(
+        api_key
+        and api_key.is_active
+        and (not api_key.expires_at or api_key.expires_at > datetime.now())
+    )
+
+
+def invalidate_local_api_key_cache(api_key_id: Optional[str] = None) -> None:
+    """Drop cached entries for one API key id (or everything when None)."""
+    if api_key_id is None:
+        _LOCAL_CACHE.clear()
+        return
+    try:
+        api_key_id = str(UUID(str(api_key_id)))
+    except ValueError:
+        return
+    for cache_key, (_, cached_id) in list(_LOCAL_CACHE.items()):
+        if cached_id == api_key_id:
+            del _LOCAL_CACHE[cache_key]
+
+
 # ── Redis-Cached Lookup ─────────────────────────────────────────
 
 async def verify_and_get_api_key_with_cache(
     plaintext_key: str,
 ) -> Optional[ApiKey]:
     """
-    Verify API key with Redis caching.
+    Verify API key with in-process and Redis caching.
 
     Flow:
-        1. Check Redis cache (TTL: 60s)
-        2. If miss → verify against DB
-        3. Cache result if valid
+        1. Check in-process cache for the key id (TTL: API_KEY_LOCAL_CACHE_TTL)
+        2. Check Redis cache for the key id (TTL: 60s)
+        3. If miss → verify against DB
+        4. Cache the key id if valid
     """
+    settings = get_settings()
+    local_key = _local_cache_key(plaintext_key)
+    now = time.monotonic()
+
+    cached = _LOCAL_CACHE.get(local_key)
+    if cached and cached[0] > now:
+        if cached[1] is None:
+            return None
+        api_key = await get_api_key_by_id(cached[1])
+        if _is_usable(api_key):
+            return api_key
+        _LOCAL_CACHE.pop(local_key, None)
+
+    api_key = await _verify_and_get_api_key_with_redis(plaintext_key)
+
+    ttl = (
+        settings.API_KEY_LOCAL_CACHE_TTL
+        if api_key
+        else settings.API_KEY_LOCAL_CACHE_NEGATIVE_TTL
+    )
+    if ttl > 0:
+        _LOCAL_CACHE.pop(local_key, None)
+        if len(_LOCAL_CACHE) >= settings.API_KEY_LOCAL_CACHE_SIZE:
+            # Evict the oldest insertion
+            del _LOCAL_CACHE[next(iter(_LOCAL_CACHE))]
+        _LOCAL_CACHE[local_key] = (now + ttl, str(api_key.id) if api_key else None)
+
+    return api_key
+
+
+async def _verify_and_get_api_key_with_redis(
+    plaintext_key: str,
+) -> Optional[ApiKey]:
     redis = get_redis()
     cache_key = f"apikey:{plaintext_key}"
 
@@ -79,9 +151,8 @@ async def verify_and_get_api_key_with_cache(
         api_key_id = cached.decode("utf-8")
         api_key = await get_api_key_by_id(api_key_id)
 
-        if api_key and api_key.is_active:
-            if not api_key.expires_at or api_key.expires_at > datetime.now():
-                return api_key
+        if _is_usable(api_key):
+            return api_key
 
     # Cache miss or invalid — verify against DB
     api_key = await verify_against_db(plaintext_key)
@@ -120,7 +191,8 @@ async def get_api_key_by_id(api_key_id: str) -> Optional[ApiKey]:
 
 
 async def invalidate_api_key_cache(plaintext_key: str) -> None:
-    """Remove an API key from Redis cache."""
+    """Remove an API key from the in-process and Redis caches."""
+    _LOCAL_CACHE.pop(_local_cache_key(plaintext_key), None)
     redis = get_redis()
     await redis.delete(f"apikey:{plaintext_key}")
 
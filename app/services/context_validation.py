@@ -4,6 +4,9 @@ Context length validation — pre-request check to prevent OOM / wasted calls.
 
 from __future__ import annotations
 
+import re
+from functools import lru_cache
+
 import structlog
 from fastapi import HTTPException
 
@@ -11,6 +14,54 @@ from app.models.schemas import ChatCompletionRequest, ModelConfig
 
 logger = structlog.get_logger(__name__)
 
+# CJK Unified Ideographs + Hiragana/Katakana; counted in C by the regex engine
+# instead of a per-character Python loop.
+_CJK_RE = re.compile("[\u4e00-\u9fff\u3040-\u30ff]")
+
+# Memoised CJK counts; texts longer than _CJK_CACHE_MAX_TEXT_LEN are counted
+# directly rather than pinned in the cache (bounds it to a few MB per worker).
+_CJK_CACHE_SIZE = 1024
+_CJK_CACHE_MAX_TEXT_LEN = 2048
+
+
+def _count_cjk(text: str) -> int:
+    # str.isascii() reads CPython's compact-ASCII flag, so pure-ASCII text
+    # (English, code, JSON) skips the regex scan entirely.
+    if text.isascii():
+        return 0
+    return len(_CJK_RE.findall(text))
+
+
+@lru_cache(maxsize=_CJK_CACHE_SIZE)
+def _count_cjk_cached(text: str) -> int:
+    """Memoised CJK count — repeated system prompts / few-shot turns hit the cache.
+
+    Hit/miss stats are available via ``_count_cjk_cached.cache_info()``.
+    """
+    return _count_cjk(text)
+
+
+def _count_message_cjk(text: str) -> int:
+    if len(text) > _CJK_CACHE_MAX_TEXT_LEN:
+        return _count_cjk(text)
+    return _count_cjk_cached(text)
+
+
+def _tokens_from_counts(length: int, cjk_chars: int) -> int:
+    """Apply the chars-per-token heuristic to pre-computed character counts."""
+    if not length:
+        return 0
+
+    # Simple CJK detection ratio
+    cjk_ratio = cjk_chars / length
+
+    if cjk_ratio > 0.3:
+        chars_per_token = 2.0
+    else:
+        chars_per_token = 4.0
+
+    return int(length / chars_per_token)
+
 
 def estimate_tokens(text: str, model_family: str | None = None) -> int:
     """
@@ -21,17 +72,41 @@ def estimate_tokens(text: str, model_family: str | None = None) -> int:
     """
     if not text:
         return 0
+    return _tokens_from_counts(len(text), _count_cjk(text))
 
-    # Simple CJK detection ratio
-    cjk_chars = sum(1 for ch in text if "\u4e00" <= ch <= "\u9fff" or "\u3040" <= ch <= "\u30ff")
-    cjk_ratio = cjk_chars / max(len(text), 1)
 
-    if cjk_ratio > 0.3:
-        chars_per_token = 2.0
-    else:
-        chars_per_token = 4.0
+def _messages_text_length(request: ChatCompletionRequest) -> int:
+    """Length of the ``"role: content"`` lines of all messages, joined by ``\\n``."""
+    length = max(len(request.messages) - 1, 0)  # "\n" separators
+    for msg in request.messages:
+        length += len(msg.role) + 2 + len(msg.get_text_content())  # "role: text"
+    return length
 
-    return int(len(text) / chars_per_token)
+
+def _estimate_messages_tokens(request: ChatCompletionRequest) -> int:
+    """
+    Estimate tokens for the ``"role: content"`` lines of all messages.
+
+    Equivalent to ``estimate_tokens("\\n".join(...))`` over the whole
+    conversation, but built from per-message counts so each message's CJK
+    scan is served from the LRU cache when the same text is seen again.
+    """
+    # Roles are ASCII, so only the content can contain CJK
+    cjk_chars = 0
+    for msg in request.messages:
+        cjk_chars += _count_message_cjk(msg.get_text_content())
+    return _tokens_from_counts(_messages_text_length(request), cjk_chars)
+
+
+def _messages_token_bounds(request: ChatCompletionRequest) -> tuple[int, int]:
+    """
+    ``(lower, upper)`` bounds on ``_estimate_messages_tokens`` from lengths alone.
+
+    The heuristic yields one token per 4 or per 2 characters depending on
+    the CJK ratio, so these hold for any mix of text and need no CJK scan.
+    """
+    length = _messages_text_length(request)
+    return length // 4, length // 2
 
 
 async def validate_context_length(
@@ -46,13 +121,11 @@ async def validate_context_length(
         - Wasted API calls
         - Bad user experience
     """
-    messages_text = "\n".join(
-        f"{msg.role}: {msg.get_text_content()}" for msg in request.messages
-    )
-
-    # Warn if vision content is being sent
-    has_vision = any(msg.has_vision_content() for msg in request.messages)
-    if has_vision and not model.supports_vision:
+    # Reject image parts on text-only models before any token math; the
+    # scan is skipped entirely when the model supports vision.
+    if not model.supports_vision and any(
+        msg.has_vision_content() for msg in request.messages
+    ):
         raise HTTPException(
             400,
             detail={
@@ -64,8 +137,26 @@ async def validate_context_length(
             },
         )
 
-    estimated_input_tokens = estimate_tokens(messages_text, model.model_family)
     requested_output = request.max_tokens or model.max_output_tokens
+    input_budget = model.context_window - requested_output
+    lower_bound, upper_bound = _messages_token_bounds(request)
+
+    # Short chats can't reach the limit or the 80% warning even in the
+    # worst case — skip the estimate entirely.
+    if upper_bound + requested_output <= model.context_window * 0.8:
+        return
+
+    if (
+        upper_bound <= input_budget
+        and lower_bound + requested_output > model.context_window * 0.8
+    ):
+        # Fits and is near the limit whatever the CJK ratio — the warning
+        # fires either way, so skip the scan and log the lower bound.
+        estimated_input_tokens = lower_bound
+    else:
+        # Anything that may be rejected is counted exactly so the 400
+        # details report the real estimate.
+        estimated_input_tokens = _estimate_messages_tokens(request)
     total_tokens = estimated_input_tokens + requested_output
 
     if total_tokens > model.context_window:
@@ -12,6 +12,16 @@ from typing import Any
 from app.models.schemas import ChatCompletionRequest
 
 
+# Sanitizer patterns, compiled once at import
+_UNIX_PY_RE = re.compile(r"/[^\s]+\.py")
+_UNIX_DIR_RE = re.compile(r"/[^\s]+/")
+_WIN_PY_RE = re.compile(r"[A-Z]:\\[^\s]+\.py")
+_WIN_DIR_RE = re.compile(r"[A-Z]:\\[^\s]+\\\\")
+_IP_RE = re.compile(r"\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}")
+_BEARER_RE = re.compile(r"Bearer [^\s]+")
+_API_KEY_RE = re.compile(r"sk-[^\s]+")
+
+
 async def sanitize_request_metadata(request: ChatCompletionRequest) -> dict[str, Any]:
     """
     Extract only metadata from a chat completion request.
@@ -51,18 +61,28 @@ def sanitize_error_message(error: str, max_length: int = 200) -> str:
     if len(error) > max_length:
         error = error[:max_length] + "... (truncated)"
 
+    # Each rule is gated on a literal every one of its matches must contain;
+    # ``in`` is a C-level substring search, so most messages skip most regex
+    # passes. Gates are checked on the current text since earlier rules can
+    # introduce "/" and ".".
+
     # Remove file paths
-    error = re.sub(r"/[^\s]+\.py", "*.py", error)
-    error = re.sub(r"/[^\s]+/", "[PATH]/", error)
-    error = re.sub(r"[A-Z]:\\[^\s]+\.py", "*.py", error)
-    error = re.sub(r"[A-Z]:\\[^\s]+\\\\", "[PATH]/", error)
+    if "/" in error:
+        error = _UNIX_PY_RE.sub("*.py", error)
+        error = _UNIX_DIR_RE.sub("[PATH]/", error)
+    if ":\\" in error:
+        error = _WIN_PY_RE.sub("*.py", error)
+        error = _WIN_DIR_RE.sub("[PATH]/", error)
 
     # Remove IP addresses
-    error = re.sub(r"\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}", "[IP]", error)
+    if "." in error:
+        error = _IP_RE.sub("[IP]", error)
 
     # Remove authentication tokens
-    error = re.sub(r"Bearer [^\s]+", "Bearer [REDACTED]", error)
-    error = re.sub(r"sk-[^\s]+", "sk-[REDACTED]", error)
+    if "Bearer " in error:
+        error = _BEARER_RE.sub("Bearer [REDACTED]", error)
+    if "sk-" in error:
+        error = _API_KEY_RE.sub("sk-[REDACTED]", error)
 
     return error
 
@@ -71,8 +91,8 @@ def classify_and_sanitize_error(error: Exception) -> tuple[str, str]:
     """
     Classify error and return (error_code, sanitized_message).
     """
-    error_str = str(error).lower()
     original_error = str(error)
+    error_str = original_error.lower()
 
     if "out of memory" in error_str or "oom" in error_str:
         return "oom_error", "Model ran out of memory. Try reducing max_tokens or prompt length."
@@ -1,12 +1,16 @@
 
 import asyncio
+import io
 import os
 import json
+
 import httpx
+import orjson
 from dotenv import load_dotenv
 
-# Load .env to get GATEWAY_SHARED_SECRET
-load_dotenv()
+# Load .env to get GATEWAY_SHARED_SECRET (skipped when already exported)
+if not os.getenv("GATEWAY_SHARED_SECRET"):
+    load_dotenv()
 
 GATEWAY_URL = "http://localhost:8000"
 GATEWAY_SECRET = os.getenv("GATEWAY_SHARED_SECRET")
@@ -25,33 +29,67 @@ MODEL = "llama3.2-3b-instruct"
 # ── Shared helpers ───────────────────────────────────────────────
 
 
-async def _stream_response(response):
-    """Read and print a streaming SSE response."""
+async def _stream_response(response, out):
+    """Read a streaming SSE response and write it to ``out``."""
     if response.status_code != 200:
         error_text = await response.read()
-        print(f"Error Response: {error_text.decode()}")
+        print(f"Error Response: {error_text.decode()}", file=out)
         return
-    print("Response Stream: ", end="", flush=True)
-    async for line in response.aiter_lines():
-        if line.startswith("data: ") and line != "data: [DONE]":
-            try:
-                chunk = json.loads(line[6:])
-                delta = chunk["choices"][0].get("delta", {})
-                content = delta.get("content", "")
-                if content:
-                    print(content, end="", flush=True)
-            except json.JSONDecodeError:
-                pass
-    print("\n[Stream Finished]")
+    print("Response Stream: ", end="", file=out)
+    # Split frames on raw b"\n" instead of aiter_lines() so each event stays
+    # in bytes until orjson parses it.
+    buf = bytearray()
+    async for data in response.aiter_bytes():
+        buf += data
+        while (i := buf.find(b"\n")) != -1:
+            line = bytes(buf[:i]).rstrip(b"\r")
+            del buf[:i + 1]
+            if line.startswith(b"data: ") and line != b"data: [DONE]":
+                try:
+                    chunk = orjson.loads(line[6:])
+                    delta = chunk["choices"][0].get("delta", {})
+                    content = delta.get("content", "")
+                    if content:
+                        print(content, end="", file=out)
+                except orjson.JSONDecodeError:
+                    pass
+    print("\n[Stream Finished]", file=out)
+
+
+async def _send_stream(client, url, headers, payload, out):
+    """POST a streaming chat request and write status + stream to ``out``."""
+    try:
+        async with client.stream("POST", url, headers=headers, json=payload) as response:
+            print(f"Status Code: {response.status_code}", file=out)
+            await _stream_response(response, out)
+    except httpx.ConnectError:
+        print("ERROR: Could not connect to Gateway.", file=out)
+    except Exception as e:
+        print(f"ERROR: {e}", file=out)
+
+
+async def _send_plain(client, headers, payload, out):
+    """POST a non-streaming chat request and write status / error to ``out``."""
+    try:
+        resp = await client.post(f"{GATEWAY_URL}/v1/chat/completions", headers=headers, json=payload)
+        print(f"Status Code: {resp.status_code}", file=out)
+        if resp.status_code != 200:
+            print(f"Error: {resp.text}", file=out)
+    except httpx.ConnectError:
+        print("ERROR: Could not connect to Gateway.", file=out)
 
 
 # ── CASE helpers ─────────────────────────────────────────────────
+#
+# Each helper buffers its output and returns it as a string so cases can
+# run concurrently without interleaving on stdout.
 
 
-async def send_chat_with_shared_secret(secret, user_oid, description, app_id=None):
+async def send_chat_with_shared_secret(client, secret, user_oid, description, app_id=None):
     """Route 1: Shared Secret + X-User-Oid + X-App-Id (web app auth)."""
-    print(f"\n[{description}]")
-    print(f"Secret: {secret[:5]}... | User: {user_oid} | App: {app_id}")
+    out = io.StringIO()
+    print(f"\n[{description}]", file=out)
+    print(f"Secret: {secret[:5]}... | User: {user_oid} | App: {app_id}", file=out)
     
     headers = {
         "X-Gateway-Secret": secret,
@@ -63,21 +101,15 @@ async def send_chat_with_shared_secret(secret, user_oid, description, app_id=Non
     
     payload = {"model": MODEL, "messages": MESSAGES, "stream": True, "max_tokens": 50}
     
-    async with httpx.AsyncClient() as client:
-        try:
-            async with client.stream("POST", f"{GATEWAY_URL}/v1/chat/completions", headers=headers, json=payload) as response:
-                print(f"Status Code: {response.status_code}")
-                await _stream_response(response)
-        except httpx.ConnectError:
-            print("ERROR: Could not connect to Gateway.")
-        except Exception as e:
-            print(f"ERROR: {e}")
-
-
-async def send_chat_with_headers(api_key, user_oid, app_id, description):
+    await _send_stream(client, f"{GATEWAY_URL}/v1/chat/completions", headers, payload, out)
+    return out.getvalue()
+
+
+async def send_chat_with_headers(client, api_key, user_oid, app_id, description):
     """Route 2b: API Key + X-User-Oid + X-App-Id headers (delegated billing via headers)."""
-    print(f"\n[{description}]")
-    print(f"API Key: {api_key[:12]}... | User: {user_oid} | App: {app_id}")
+    out = io.StringIO()
+    print(f"\n[{description}]", file=out)
+    print(f"API Key: {api_key[:12]}... | User: {user_oid} | App: {app_id}", file=out)
     
     headers = {
         "Authorization": f"Bearer {api_key}",
@@ -88,22 +120,16 @@ async def send_chat_with_headers(api_key, user_oid, app_id, description):
     
     payload = {"model": MODEL, "messages": MESSAGES, "stream": True, "max_tokens": 50}
     
-    async with httpx.AsyncClient() as client:
-        try:
-            async with client.stream("POST", f"{GATEWAY_URL}/v1/chat/completions", headers=headers, json=payload) as response:
-                print(f"Status Code: {response.status_code}")
-                await _stream_response(response)
-        except httpx.ConnectError:
-            print("ERROR: Could not connect to Gateway.")
-        except Exception as e:
-            print(f"ERROR: {e}")
-
-
-async def send_chat_with_query_params(api_key, user_oid, app_id, description):
+    await _send_stream(client, f"{GATEWAY_URL}/v1/chat/completions", headers, payload, out)
+    return out.getvalue()
+
+
+async def send_chat_with_query_params(client, api_key, user_oid, app_id, description):
     """Route 2b: API Key + URL query params (delegated billing via URL)."""
-    print(f"\n[{description}]")
+    out = io.StringIO()
+    print(f"\n[{description}]", file=out)
     url = f"{GATEWAY_URL}/v1/chat/completions?x_user_oid={user_oid}&x_app_id={app_id}"
-    print(f"API Key: {api_key[:12]}... | URL: ...?x_user_oid={user_oid}&x_app_id={app_id}")
+    print(f"API Key: {api_key[:12]}... | URL: ...?x_user_oid={user_oid}&x_app_id={app_id}", file=out)
     
     headers = {
         "Authorization": f"Bearer {api_key}",
@@ -112,21 +138,15 @@ async def send_chat_with_query_params(api_key, user_oid, app_id, description):
     
     payload = {"model": MODEL, "messages": MESSAGES, "stream": True, "max_tokens": 50}
     
-    async with httpx.AsyncClient() as client:
-        try:
-            async with client.stream("POST", url, headers=headers, json=payload) as response:
-                print(f"Status Code: {response.status_code}")
-                await _stream_response(response)
-        except httpx.ConnectError:
-            print("ERROR: Could not connect to Gateway.")
-        except Exception as e:
-            print(f"ERROR: {e}")
-
-
-async def send_chat_with_body_params(api_key, user_oid, app_id, description):
+    await _send_stream(client, url, headers, payload, out)
+    return out.getvalue()
+
+
+async def send_chat_with_body_params(client, api_key, user_oid, app_id, description):
     """Route 2b: API Key + body x_user_oid/x_app_id (delegated billing via body top-level fields)."""
-    print(f"\n[{description}]")
-    print(f"API Key: {api_key[:12]}... | Body: x_user_oid={user_oid}, x_app_id={app_id}")
+    out = io.StringIO()
+    print(f"\n[{description}]", file=out)
+    print(f"API Key: {api_key[:12]}... | Body: x_user_oid={user_oid}, x_app_id={app_id}", file=out)
     
     headers = {
         "Authorization": f"Bearer {api_key}",
@@ -142,18 +162,11 @@ async def send_chat_with_body_params(api_key, user_oid, app_id, description):
         "x_app_id": app_id,
     }
     
-    async with httpx.AsyncClient() as client:
-        try:
-            async with client.stream("POST", f"{GATEWAY_URL}/v1/chat/completions", headers=headers, json=payload) as response:
-                print(f"Status Code: {response.status_code}")
-                await _stream_response(response)
-        except httpx.ConnectError:
-            print("ERROR: Could not connect to Gateway.")
-        except Exception as e:
-            print(f"ERROR: {e}")
-
-
-async def send_chat_with_message_json(api_key, user_oid, app_id, user_message, description):
+    await _send_stream(client, f"{GATEWAY_URL}/v1/chat/completions", headers, payload, out)
+    return out.getvalue()
+
+
+async def send_chat_with_message_json(client, api_key, user_oid, app_id, user_message, description):
     """Route 2b: API Key + delegation JSON embedded in message content (Dify LLM node style).
     
     The user message content is a JSON string:
@@ -161,13 +174,14 @@ async def send_chat_with_message_json(api_key, user_oid, app_id, user_message, d
     Gateway parses this, extracts delegation params, and rewrites the message
     to clean text before sending to the LLM.
     """
-    print(f"\n[{description}]")
+    out = io.StringIO()
+    print(f"\n[{description}]", file=out)
     delegation_json = json.dumps({
         "x_user_oid": user_oid,
         "x_app_id": app_id,
         "message": user_message,
     })
-    print(f"API Key: {api_key[:12]}... | Message content: {delegation_json[:60]}...")
+    print(f"API Key: {api_key[:12]}... | Message content: {delegation_json[:60]}...", file=out)
     
     headers = {
         "Authorization": f"Bearer {api_key}",
@@ -181,15 +195,17 @@ async def send_chat_with_message_json(api_key, user_oid, app_id, user_message, d
         "max_tokens": 50,
     }
     
-    async with httpx.AsyncClient() as client:
-        try:
-            async with client.stream("POST", f"{GATEWAY_URL}/v1/chat/completions", headers=headers, json=payload) as response:
-                print(f"Status Code: {response.status_code}")
-                await _stream_response(response)
-        except httpx.ConnectError:
-            print("ERROR: Could not connect to Gateway.")
-        except Exception as e:
-            print(f"ERROR: {e}")
+    await _send_stream(client, f"{GATEWAY_URL}/v1/chat/completions", headers, payload, out)
+    return out.getvalue()
+
+
+async def send_error_case(client, api_key, payload, description):
+    """Error case: non-streaming request that is expected to be rejected."""
+    out = io.StringIO()
+    print(f"\n[{description}]", file=out)
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    await _send_plain(client, headers, payload, out)
+    return out.getvalue()
 
 
 # ── Main test runner ─────────────────────────────────────────────
@@ -200,135 +216,138 @@ async def test_webapp_access():
     print("  LLM Gateway — Web App Access & Delegated Billing Tests")
     print("=" * 60)
 
-    # ── Section 1: Shared Secret auth ────────────────────────────
-    print("\n--- Section 1: Shared Secret Auth (X-Gateway-Secret) ---")
-    
-    if not GATEWAY_SECRET:
-        print("SKIP: GATEWAY_SHARED_SECRET not found in .env")
-    else:
-        # 1. Success — all three headers
-        await send_chat_with_shared_secret(
-            GATEWAY_SECRET, TEST_USER_OID,
-            "CASE 1: Valid Secret + User + App ID (expect 200)",
-            app_id=TEST_APP_ID,
-        )
-        # 2. Invalid Secret
-        await send_chat_with_shared_secret(
-            "wrong-secret-key", TEST_USER_OID,
-            "CASE 2: Invalid Secret (expect 401)",
-            app_id=TEST_APP_ID,
-        )
-        # 3. Missing App ID
-        await send_chat_with_shared_secret(
-            GATEWAY_SECRET, TEST_USER_OID,
-            "CASE 3: Missing X-App-Id (expect 401)",
-        )
-
-    # ── Section 2: Delegated billing via headers ─────────────────
-    print("\n--- Section 2: Delegated Billing via Headers ---")
-    
-    if not TEST_API_KEY:
-        print("SKIP: TEST_API_KEY not set")
-    else:
-        await send_chat_with_headers(
-            TEST_API_KEY, TEST_USER_OID, TEST_APP_ID,
-            "CASE 4: API Key + X-User-Oid + X-App-Id headers (expect 200)",
-        )
-
-    # ── Section 3: Delegated billing via URL query params ────────
-    print("\n--- Section 3: Delegated Billing via URL Query Params ---")
-    
-    if not TEST_API_KEY:
-        print("SKIP: TEST_API_KEY not set")
-    else:
-        await send_chat_with_query_params(
-            TEST_API_KEY, TEST_USER_OID, TEST_APP_ID,
-            "CASE 5: API Key + URL ?x_user_oid=...&x_app_id=... (expect 200)",
-        )
-
-    # ── Section 4: Delegated billing via request body ────────────
-    print("\n--- Section 4: Delegated Billing via Body Top-Level Fields ---")
-    
-    if not TEST_API_KEY:
-        print("SKIP: TEST_API_KEY not set")
-    else:
-        await send_chat_with_body_params(
-            TEST_API_KEY, TEST_USER_OID, TEST_APP_ID,
-            "CASE 6: API Key + body x_user_oid/x_app_id (expect 200)",
-        )
-
-    # ── Section 5: Delegated billing via message content JSON ────
-    print("\n--- Section 5: Delegated Billing via Message Content JSON (Dify LLM node) ---")
-    
-    if not TEST_API_KEY:
-        print("SKIP: TEST_API_KEY not set")
-    else:
-        await send_chat_with_message_json(
-            TEST_API_KEY, TEST_USER_OID, TEST_APP_ID,
-            "Hello! Reply with 'Gateway Access Confirmed'.",
-            "CASE 7: API Key + delegation JSON in message content (expect 200)",
-        )
-
-    # ── Section 6: Error cases ───────────────────────────────────
-    print("\n--- Section 6: Error Cases ---")
-    
-    if TEST_API_KEY:
-        # Body with only x_user_oid, no x_app_id → 401
-        print(f"\n[CASE 8: Body x_user_oid only, no x_app_id (expect 401)]")
-        headers = {"Authorization": f"Bearer {TEST_API_KEY}", "Content-Type": "application/json"}
-        payload = {
-            "model": MODEL,
-            "messages": MESSAGES,
-            "max_tokens": 50,
-            "x_user_oid": TEST_USER_OID,
-        }
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.post(f"{GATEWAY_URL}/v1/chat/completions", headers=headers, json=payload)
-                print(f"Status Code: {resp.status_code}")
-                if resp.status_code != 200:
-                    print(f"Error: {resp.text}")
-            except httpx.ConnectError:
-                print("ERROR: Could not connect to Gateway.")
-
-        # Body with non-existent app → 401
-        print(f"\n[CASE 9: Body with non-existent app (expect 401)]")
-        payload = {
-            "model": MODEL,
-            "messages": MESSAGES,
-            "max_tokens": 50,
-            "x_user_oid": TEST_USER_OID,
-            "x_app_id": "nonexistent-app-999",
-        }
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.post(f"{GATEWAY_URL}/v1/chat/completions", headers=headers, json=payload)
-                print(f"Status Code: {resp.status_code}")
-                if resp.status_code != 200:
-                    print(f"Error: {resp.text}")
-            except httpx.ConnectError:
-                print("ERROR: Could not connect to Gateway.")
-
-        # Message content JSON with non-existent app → 401
-        print(f"\n[CASE 10: Message JSON with non-existent app (expect 401)]")
-        delegation_json = json.dumps({
-            "x_user_oid": TEST_USER_OID,
-            "x_app_id": "nonexistent-app-999",
-            "message": "should fail",
-        })
-        payload = {
-            "model": MODEL,
-            "messages": [{"role": "user", "content": delegation_json}],
-            "max_tokens": 50,
-        }
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.post(f"{GATEWAY_URL}/v1/chat/completions", headers=headers, json=payload)
-                print(f"Status Code: {resp.status_code}")
-                if resp.status_code != 200:
-                    print(f"Error: {resp.text}")
-            except httpx.ConnectError:
-                print("ERROR: Could not connect to Gateway.")
+    # HTTP/2 multiplexes the concurrent cases over one connection when the
+    # gateway is served over TLS; plain http:// falls back to HTTP/1.1 and
+    # the explicit pool limits keep every case on its own keep-alive socket.
+    async with httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=50, max_connections=100, keepalive_expiry=30),
+        timeout=httpx.Timeout(30.0, connect=5.0),
+    ) as client:
+        # (section header, case coroutines) — all cases are independent, so
+        # they are fired together and their buffered output printed in order.
+        sections: list[tuple[str, list]] = []
+
+        # ── Section 1: Shared Secret auth ────────────────────────
+        header = "\n--- Section 1: Shared Secret Auth (X-Gateway-Secret) ---"
+        if not GATEWAY_SECRET:
+            sections.append((header + "\nSKIP: GATEWAY_SHARED_SECRET not found in .env", []))
+        else:
+            sections.append((header, [
+                # 1. Success — all three headers
+                send_chat_with_shared_secret(
+                    client, GATEWAY_SECRET, TEST_USER_OID,
+                    "CASE 1: Valid Secret + User + App ID (expect 200)",
+                    app_id=TEST_APP_ID,
+                ),
+                # 2. Invalid Secret
+                send_chat_with_shared_secret(
+                    client, "wrong-secret-key", TEST_USER_OID,
+                    "CASE 2: Invalid Secret (expect 401)",
+                    app_id=TEST_APP_ID,
+                ),
+                # 3. Missing App ID
+                send_chat_with_shared_secret(
+                    client, GATEWAY_SECRET, TEST_USER_OID,
+                    "CASE 3: Missing X-App-Id (expect 401)",
+                ),
+            ]))
+
+        if not TEST_API_KEY:
+            for header in (
+                "\n--- Section 2: Delegated Billing via Headers ---",
+                "\n--- Section 3: Delegated Billing via URL Query Params ---",
+                "\n--- Section 4: Delegated Billing via Body Top-Level Fields ---",
+                "\n--- Section 5: Delegated Billing via Message Content JSON (Dify LLM node) ---",
+            ):
+                sections.append((header + "\nSKIP: TEST_API_KEY not set", []))
+            sections.append(("\n--- Section 6: Error Cases ---", []))
+        else:
+            # ── Section 2: Delegated billing via headers ─────────
+            sections.append(("\n--- Section 2: Delegated Billing via Headers ---", [
+                send_chat_with_headers(
+                    client, TEST_API_KEY, TEST_USER_OID, TEST_APP_ID,
+                    "CASE 4: API Key + X-User-Oid + X-App-Id headers (expect 200)",
+                ),
+            ]))
+
+            # ── Section 3: Delegated billing via URL query params ─
+            sections.append(("\n--- Section 3: Delegated Billing via URL Query Params ---", [
+                send_chat_with_query_params(
+                    client, TEST_API_KEY, TEST_USER_OID, TEST_APP_ID,
+                    "CASE 5: API Key + URL ?x_user_oid=...&x_app_id=... (expect 200)",
+                ),
+            ]))
+
+            # ── Section 4: Delegated billing via request body ────
+            sections.append(("\n--- Section 4: Delegated Billing via Body Top-Level Fields ---", [
+                send_chat_with_body_params(
+                    client, TEST_API_KEY, TEST_USER_OID, TEST_APP_ID,
+                    "CASE 6: API Key + body x_user_oid/x_app_id (expect 200)",
+                ),
+            ]))
+
+            # ── Section 5: Delegated billing via message content JSON
+            sections.append(("\n--- Section 5: Delegated Billing via Message Content JSON (Dify LLM node) ---", [
+                send_chat_with_message_json(
+                    client, TEST_API_KEY, TEST_USER_OID, TEST_APP_ID,
+                    "Hello! Reply with 'Gateway Access Confirmed'.",
+                    "CASE 7: API Key + delegation JSON in message content (expect 200)",
+                ),
+            ]))
+
+            # ── Section 6: Error cases ───────────────────────────
+            sections.append(("\n--- Section 6: Error Cases ---", [
+                # Body with only x_user_oid, no x_app_id → 401
+                send_error_case(
+                    client, TEST_API_KEY,
+                    {
+                        "model": MODEL,
+                        "messages": MESSAGES,
+                        "max_tokens": 50,
+                        "x_user_oid": TEST_USER_OID,
+                    },
+                    "CASE 8: Body x_user_oid only, no x_app_id (expect 401)",
+                ),
+                # Body with non-existent app → 401
+                send_error_case(
+                    client, TEST_API_KEY,
+                    {
+                        "model": MODEL,
+                        "messages": MESSAGES,
+                        "max_tokens": 50,
+                        "x_user_oid": TEST_USER_OID,
+                        "x_app_id": "nonexistent-app-999",
+                    },
+                    "CASE 9: Body with non-existent app (expect 401)",
+                ),
+                # Message content JSON with non-existent app → 401
+                send_error_case(
+                    client, TEST_API_KEY,
+                    {
+                        "model": MODEL,
+                        "messages": [{"role": "user", "content": json.dumps({
+                            "x_user_oid": TEST_USER_OID,
+                            "x_app_id": "nonexistent-app-999",
+                            "message": "should fail",
+                        })}],
+                        "max_tokens": 50,
+                    },
+                    "CASE 10: Message JSON with non-existent app (expect 401)",
+                ),
+            ]))
+
+        cases = [case for _, section_cases in sections for case in section_cases]
+        results = iter(await asyncio.gather(*cases, return_exceptions=True))
+
+    for header, section_cases in sections:
+        print(header)
+        for _ in section_cases:
+            result = next(results)
+            if isinstance(result, BaseException):
+                print(f"\nERROR: {result}")
+            else:
+                print(result, end="")
 
     print("\n" + "=" * 60)
     print("  All tests completed.")
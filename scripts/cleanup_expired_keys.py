@@ -9,6 +9,24 @@ import os
 import asyncpg
 import httpx
 
+WEBHOOK_MAX_ATTEMPTS = 3
+WEBHOOK_BACKOFF_BASE = 0.5  # seconds; doubled on each retry
+
+
+async def _send_webhook(client: httpx.AsyncClient, url: str, payload: dict) -> httpx.Response:
+    """POST a webhook, retrying transport errors with exponential backoff.
+
+    Uses ``asyncio.sleep`` so a slow endpoint never blocks the other
+    in-flight notifications.
+    """
+    for attempt in range(WEBHOOK_MAX_ATTEMPTS):
+        try:
+            return await client.post(url, json=payload)
+        except (httpx.TimeoutException, httpx.TransportError):
+            if attempt == WEBHOOK_MAX_ATTEMPTS - 1:
+                raise
+            await asyncio.sleep(WEBHOOK_BACKOFF_BASE * 2 ** attempt)
+
 
 async def cleanup_expired_keys():
     database_url = os.environ.get(
@@ -28,31 +46,56 @@ async def cleanup_expired_keys():
         )
 
         print(f"Deactivated {len(rows)} expired API keys")
+        if not rows:
+            return
 
-        for row in rows:
-            print(f"  - key={row['id']}  user={row['user_oid']}  label={row['label']}")
-
-            # Notify user via webhook (if configured)
-            user = await conn.fetchrow(
-                "SELECT webhook_url FROM Users WHERE oid = $1", row["user_oid"]
+        # Resolve all webhook URLs in one round-trip
+        user_oids = list({row["user_oid"] for row in rows})
+        webhooks = {
+            user["oid"]: user["webhook_url"]
+            for user in await conn.fetch(
+                """
+                SELECT oid, webhook_url FROM Users
+                WHERE oid = ANY($1::text[])
+                  AND webhook_url IS NOT NULL
+                """,
+                user_oids,
             )
-            if user and user["webhook_url"]:
-                try:
-                    async with httpx.AsyncClient(timeout=10) as client:
-                        await client.post(
-                            user["webhook_url"],
-                            json={
-                                "type": "api_key_expired",
-                                "key_id": str(row["id"]),
-                                "label": row["label"],
-                            },
-                        )
-                except Exception as e:
-                    print(f"  Webhook notification failed: {e}")
-
+        }
     finally:
         await conn.close()
 
+    # Notify users via webhook (if configured), concurrently over one client
+    notifications = []
+    for row in rows:
+        print(f"  - key={row['id']}  user={row['user_oid']}  label={row['label']}")
+        url = webhooks.get(row["user_oid"])
+        if url:
+            notifications.append((
+                row,
+                url,
+                {
+                    "type": "api_key_expired",
+                    "key_id": str(row["id"]),
+                    "label": row["label"],
+                },
+            ))
+
+    if not notifications:
+        return
+
+    async with httpx.AsyncClient(
+        timeout=10, limits=httpx.Limits(max_connections=32)
+    ) as client:
+        results = await asyncio.gather(
+            *(_send_webhook(client, url, payload) for _, url, payload in notifications),
+            return_exceptions=True,
+        )
+
+    for (row, _, _), result in zip(notifications, results):
+        if isinstance(result, Exception):
+            print(f"  Webhook notification failed: key={row['id']}  error={result}")
+
 
 if __name__ == "__main__":
     asyncio.run(cleanup_expired_keys())
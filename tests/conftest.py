@@ -0,0 +1,50 @@
+"""
+Shared fixtures for the HTTP-level tests.
+"""
+
+import pytest
+from unittest.mock import AsyncMock
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.schemas import ApiKey
+from app.routers.chat import invalidate_models_list_cache
+
+
+@pytest.fixture(scope="session")
+def client():
+    # Deliberately not entered as a context manager: running the lifespan
+    # would connect to Postgres / Redis. Every test mocks the DB instead.
+    return TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def _clear_models_list_cache():
+    """Keep /v1/models responses from leaking between tests."""
+    yield
+    invalidate_models_list_cache()
+
+
+@pytest.fixture(scope="session")
+def fake_api_key():
+    return ApiKey(
+        id="123e4567-e89b-12d3-a456-426614174000",
+        user_oid="user-123",
+        hashed_key="hashed",
+        salt="salt",
+        display_prefix="sk-...",
+        scopes=["chat.completions"],
+    )
+
+
+@pytest.fixture
+def mock_gateway_auth(monkeypatch, fake_api_key):
+    """Let requests through GatewayMiddleware with ``fake_api_key``; returns the key."""
+    monkeypatch.setattr(
+        "app.middleware.gateway.verify_and_get_api_key_with_cache",
+        AsyncMock(return_value=fake_api_key),
+    )
+    monkeypatch.setattr("app.middleware.gateway.check_ip_allowlist", AsyncMock())
+    monkeypatch.setattr("app.middleware.gateway._validate_user", AsyncMock())
+    monkeypatch.setattr("app.middleware.gateway._check_rate_limit", AsyncMock())
+    return fake_api_key
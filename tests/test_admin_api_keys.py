@@ -1,5 +1,4 @@
 
-import pytest
 from unittest.mock import AsyncMock, patch
 from uuid import uuid4
 from fastapi.testclient import TestClient
@@ -10,9 +9,9 @@ from app.main import app
 # We'll mock lifespan or init_db/init_redis inside app.main so verify_admin doesn't crash during startup.
 
 client = TestClient(app)
+admin_client = TestClient(app, cookies={"admin_token": "valid-token"})
 
-@pytest.mark.asyncio
-async def test_delete_api_key_authed():
+def test_delete_api_key_authed():
     key_id = str(uuid4())
     
     # Mock database interactions and token verification
@@ -25,10 +24,7 @@ async def test_delete_api_key_authed():
         # simulate successful delete
         mock_execute.return_value = "DELETE 1"
 
-        response = client.delete(
-            f"/admin/api/api-keys/{key_id}",
-            cookies={"admin_token": "valid-token"}
-        )
+        response = admin_client.delete(f"/admin/api/api-keys/{key_id}")
 
         assert response.status_code == 200
         assert response.json() == {"status": "deleted"}
@@ -40,8 +36,7 @@ async def test_delete_api_key_authed():
         assert "DELETE FROM ApiKeys WHERE id = $1" in args[0]
         assert str(args[1]) == key_id
 
-@pytest.mark.asyncio
-async def test_delete_api_key_not_found():
+def test_delete_api_key_not_found():
     key_id = str(uuid4())
     
     with patch("app.routers.admin.db.fetch_one", new_callable=AsyncMock) as mock_fetch_one, \
@@ -53,10 +48,7 @@ async def test_delete_api_key_not_found():
         mock_fetch_one.return_value = None
         mock_fetch_all.return_value = []
 
-        response = client.delete(
-            f"/admin/api/api-keys/{key_id}",
-            cookies={"admin_token": "valid-token"}
-        )
+        response = admin_client.delete(f"/admin/api/api-keys/{key_id}")
 
         assert response.status_code == 404
         assert response.json()["detail"] == "API key not found"
@@ -1,15 +1,13 @@
 
-import pytest
 from unittest.mock import AsyncMock, patch
 from uuid import uuid4
 from fastapi.testclient import TestClient
 
 from app.main import app
 
-client = TestClient(app)
+client = TestClient(app, cookies={"admin_token": "valid-token"})
 
-@pytest.mark.asyncio
-async def test_delete_model_authed():
+def test_delete_model_authed():
     model_id = "test-model"
     
     with patch("app.routers.admin.db.fetch_one", new_callable=AsyncMock) as mock_fetch_one, \
@@ -21,10 +19,7 @@ async def test_delete_model_authed():
         # simulate successful delete
         mock_execute.return_value = "DELETE 1"
 
-        response = client.delete(
-            f"/admin/api/models/{model_id}",
-            cookies={"admin_token": "valid-token"}
-        )
+        response = client.delete(f"/admin/api/models/{model_id}")
 
         assert response.status_code == 200
         assert response.json() == {"status": "deleted", "id": model_id}
@@ -34,8 +29,7 @@ async def test_delete_model_authed():
         assert "DELETE FROM Models WHERE id = $1" in args[0]
         assert args[1] == model_id
 
-@pytest.mark.asyncio
-async def test_delete_model_not_found():
+def test_delete_model_not_found():
     model_id = "test-model"
     
     with patch("app.routers.admin.db.fetch_one", new_callable=AsyncMock) as mock_fetch_one, \
@@ -45,16 +39,12 @@ async def test_delete_model_not_found():
         # probe returns None
         mock_fetch_one.return_value = None
 
-        response = client.delete(
-            f"/admin/api/models/{model_id}",
-            cookies={"admin_token": "valid-token"}
-        )
+        response = client.delete(f"/admin/api/models/{model_id}")
 
         assert response.status_code == 404
         assert response.json()["detail"] == "Model not found"
 
-@pytest.mark.asyncio
-async def test_delete_model_fk_check():
+def test_delete_model_fk_check():
     model_id = "test-model"
     
     with patch("app.routers.admin.db.fetch_one", new_callable=AsyncMock) as mock_fetch_one, \
@@ -65,16 +55,12 @@ async def test_delete_model_fk_check():
         # simulate FK error
         mock_execute.side_effect = Exception("violates foreign key constraint")
 
-        response = client.delete(
-            f"/admin/api/models/{model_id}",
-            cookies={"admin_token": "valid-token"}
-        )
+        response = client.delete(f"/admin/api/models/{model_id}")
 
         assert response.status_code == 409
         assert "使用されているため削除できません" in response.json()["detail"]
 
-@pytest.mark.asyncio
-async def test_delete_endpoint_authed():
+def test_delete_endpoint_authed():
     endpoint_id = str(uuid4())
     
     with patch("app.routers.admin.db.fetch_one", new_callable=AsyncMock) as mock_fetch_one, \
@@ -86,10 +72,7 @@ async def test_delete_endpoint_authed():
         # simulate successful delete
         mock_execute.return_value = "DELETE 1"
 
-        response = client.delete(
-            f"/admin/api/endpoints/{endpoint_id}",
-            cookies={"admin_token": "valid-token"}
-        )
+        response = client.delete(f"/admin/api/endpoints/{endpoint_id}")
 
         assert response.status_code == 200
         assert response.json() == {"status": "deleted", "id": endpoint_id}
@@ -2,7 +2,17 @@
 Unit tests for API key generation & verification.
 """
 
-from app.services.api_key import generate_api_key, verify_api_key_fast
+import pytest
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+from app.models.schemas import ApiKey
+from app.services.api_key import (
+    generate_api_key,
+    invalidate_local_api_key_cache,
+    verify_and_get_api_key_with_cache,
+    verify_api_key_fast,
+)
 
 
 class TestGenerateApiKey:
@@ -50,3 +60,74 @@ class TestVerifyApiKeyFast:
     def test_empty_key_returns_false(self):
         _, hashed, salt, _ = generate_api_key()
         assert verify_api_key_fast("", hashed, salt) is False
+
+
+class TestLocalApiKeyCache:
+    @pytest.fixture(autouse=True)
+    def _clear_cache(self):
+        invalidate_local_api_key_cache()
+        yield
+        invalidate_local_api_key_cache()
+
+    @pytest.fixture
+    def api_key(self):
+        return ApiKey(
+            id=uuid4(),
+            user_oid="user-1",
+            hashed_key="a" * 64,
+            salt="b" * 32,
+            display_prefix="sk-gate-abc...",
+        )
+
+    async def test_hit_reloads_row(self, api_key):
+        fresh = api_key.model_copy(update={"last_reset_month": "2099-01"})
+        with patch(
+            "app.services.api_key._verify_and_get_api_key_with_redis",
+            new_callable=AsyncMock, return_value=api_key,
+        ) as mock_lookup, patch(
+            "app.services.api_key.get_api_key_by_id",
+            new_callable=AsyncMock, return_value=fresh,
+        ) as mock_by_id:
+            await verify_and_get_api_key_with_cache("sk-gate-x")
+            second = await verify_and_get_api_key_with_cache("sk-gate-x")
+
+        assert mock_lookup.await_count == 1
+        # Only the id is cached; the row (budget state etc.) is read fresh
+        mock_by_id.assert_awaited_once_with(str(api_key.id))
+        assert second.last_reset_month == "2099-01"
+
+    async def test_hit_on_deactivated_key_falls_through(self, api_key):
+        with patch(
+            "app.services.api_key._verify_and_get_api_key_with_redis",
+            new_callable=AsyncMock, side_effect=[api_key, None],
+        ) as mock_lookup, patch(
+            "app.services.api_key.get_api_key_by_id",
+            new_callable=AsyncMock,
+            return_value=api_key.model_copy(update={"is_active": False}),
+        ):
+            await verify_and_get_api_key_with_cache("sk-gate-x")
+            assert await verify_and_get_api_key_with_cache("sk-gate-x") is None
+
+        assert mock_lookup.await_count == 2
+
+    async def test_unknown_key_is_negative_cached(self):
+        with patch(
+            "app.services.api_key._verify_and_get_api_key_with_redis",
+            new_callable=AsyncMock, return_value=None,
+        ) as mock_lookup:
+            assert await verify_and_get_api_key_with_cache("sk-gate-bad") is None
+            assert await verify_and_get_api_key_with_cache("sk-gate-bad") is None
+
+        assert mock_lookup.await_count == 1
+
+    async def test_invalidate_by_id(self, api_key):
+        with patch(
+            "app.services.api_key._verify_and_get_api_key_with_redis",
+            new_callable=AsyncMock, return_value=api_key,
+        ) as mock_lookup:
+            await verify_and_get_api_key_with_cache("sk-gate-x")
+            # Path params may arrive uppercased / without hyphens
+            invalidate_local_api_key_cache(api_key.id.hex.upper())
+            await verify_and_get_api_key_with_cache("sk-gate-x")
+
+        assert mock_lookup.await_count == 2
@@ -5,7 +5,10 @@ Unit tests for context length validation.
 import pytest
 from unittest.mock import MagicMock
 
-from app.services.context_validation import estimate_tokens, validate_context_length
+from app.services.context_validation import (
+    _estimate_messages_tokens, _messages_token_bounds, estimate_tokens,
+    validate_context_length,
+)
 from app.models.schemas import (
     ChatCompletionRequest, ChatMessage, ContentPart, ImageUrl, ModelConfig,
 )
@@ -32,9 +35,22 @@ class TestEstimateTokens:
         long_ = estimate_tokens("word " * 100)
         assert long_ > short
 
+    def test_message_estimate_matches_joined_text(self):
+        """Per-message (cached) counting equals estimating the joined conversation."""
+        messages = [
+            ChatMessage(role="system", content="You are helpful."),
+            ChatMessage(role="user", content="こんにちは今日はお元気ですか"),
+            ChatMessage(role="assistant", content="元気です"),
+        ]
+        request = ChatCompletionRequest(model="m", messages=messages)
+        joined = "\n".join(f"{m.role}: {m.get_text_content()}" for m in messages)
+        assert _estimate_messages_tokens(request) == estimate_tokens(joined)
+        # Second call is served from the cache and stays identical
+        assert _estimate_messages_tokens(request) == estimate_tokens(joined)
+
 
 class TestValidateContextLength:
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def model(self):
         return ModelConfig(
             id="test-model",
@@ -46,7 +62,6 @@ class TestValidateContextLength:
             max_output_tokens=50,
         )
 
-    @pytest.mark.asyncio
     async def test_request_within_limit_passes(self, model):
         request = ChatCompletionRequest(
             model="test-model",
@@ -56,7 +71,6 @@ class TestValidateContextLength:
         # Should not raise
         await validate_context_length(request, model)
 
-    @pytest.mark.asyncio
     async def test_request_exceeding_limit_raises(self, model):
         # Create a message that exceeds 100 tokens
         long_content = "word " * 500  # ~250 tokens estimated
@@ -71,11 +85,72 @@ class TestValidateContextLength:
             await validate_context_length(request, model)
         assert exc_info.value.status_code == 400
 
+    async def test_cjk_document_inside_english_text_is_counted(self, model):
+        """Bounds hold for non-uniform text: a CJK middle isn't missed."""
+        from fastapi import HTTPException
+
+        big_model = model.model_copy(update={"context_window": 4000})
+        mixed = "a" * 1100 + "漢" * 8000 + "a" * 1100  # ~5100 tokens
+        request = ChatCompletionRequest(
+            model="test-model",
+            messages=[ChatMessage(role="user", content=mixed)],
+            max_tokens=10,
+        )
+        with pytest.raises(HTTPException) as exc_info:
+            await validate_context_length(request, big_model)
+        assert exc_info.value.status_code == 400
+
+        # Same length of plain ASCII (~2550 tokens) fits
+        request.messages[0].content = "a" * len(mixed)
+        await validate_context_length(request, big_model)
+
+    async def test_cjk_near_limit_warning_uses_full_estimate(self, model, monkeypatch):
+        """Upper bound fits but the lower bound alone wouldn't warn — count exactly."""
+        logger = MagicMock()
+        monkeypatch.setattr("app.services.context_validation.logger", logger)
+        request = ChatCompletionRequest(
+            model="test-model",
+            messages=[ChatMessage(role="user", content="漢" * 1790)],
+            max_tokens=50,
+        )
+        await validate_context_length(
+            request, model.model_copy(update={"context_window": 1000})
+        )
+        logger.warning.assert_called_once()
+        assert logger.warning.call_args.kwargs["total_tokens"] == 948
+
+    async def test_cjk_rejection_reports_full_estimate(self, model):
+        from fastapi import HTTPException
+
+        request = ChatCompletionRequest(
+            model="test-model",
+            messages=[ChatMessage(role="user", content="漢" * 1800)],
+            max_tokens=50,
+        )
+        with pytest.raises(HTTPException) as exc_info:
+            await validate_context_length(
+                request, model.model_copy(update={"context_window": 400})
+            )
+        details = exc_info.value.detail["error"]["details"]
+        assert details["estimated_input_tokens"] == 903
+        assert details["total_tokens"] == 953
+
+    def test_bounds_cover_estimate(self):
+        request = ChatCompletionRequest(
+            model="test-model",
+            messages=[
+                ChatMessage(role="system", content="You are helpful."),
+                ChatMessage(role="user", content="こんにちは今日はお元気ですか"),
+            ],
+        )
+        lower, upper = _messages_token_bounds(request)
+        assert lower <= _estimate_messages_tokens(request) <= upper
+
 
 class TestVisionMessageSupport:
     """Tests for VLM (Vision Language Model) multimodal content support."""
 
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def vision_model(self):
         return ModelConfig(
             id="vision-model",
@@ -88,7 +163,7 @@ class TestVisionMessageSupport:
             supports_vision=True,
         )
 
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def text_only_model(self):
         return ModelConfig(
             id="text-model",
@@ -196,7 +271,6 @@ class TestVisionMessageSupport:
 
     # ── Context validation with VLM ──────────────────────────
 
-    @pytest.mark.asyncio
     async def test_vision_request_passes_on_vision_model(self, vision_model):
         request = ChatCompletionRequest(
             model="vision-model",
@@ -217,7 +291,6 @@ class TestVisionMessageSupport:
         # Should not raise
         await validate_context_length(request, vision_model)
 
-    @pytest.mark.asyncio
     async def test_vision_request_rejected_on_text_only_model(self, text_only_model):
         request = ChatCompletionRequest(
             model="text-model",
@@ -242,7 +315,6 @@ class TestVisionMessageSupport:
         assert exc_info.value.status_code == 400
         assert "vision_not_supported" in str(exc_info.value.detail)
 
-    @pytest.mark.asyncio
     async def test_text_request_passes_on_text_only_model(self, text_only_model):
         """Standard text requests should work fine on non-vision models."""
         request = ChatCompletionRequest(
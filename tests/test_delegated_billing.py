@@ -8,29 +8,80 @@ Also supports URL query params and request body fields.
 
 import json
 import pytest
-from datetime import datetime, timedelta
+from dataclasses import dataclass
+from datetime import datetime
 from decimal import Decimal
-from unittest.mock import AsyncMock, MagicMock, patch
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
 from uuid import uuid4
 
 from fastapi import HTTPException
 
-from app.middleware.gateway import _authenticate, _extract_delegation_from_messages
+from app.middleware.gateway import (
+    _authenticate,
+    _extract_delegation_from_messages,
+    invalidate_app_status_cache,
+)
 from app.models.schemas import ApiKey
 
 
-def _make_api_key(user_oid: str = "owner-oid-1") -> ApiKey:
-    return ApiKey(
-        id=uuid4(),
-        user_oid=user_oid,
-        hashed_key="a" * 64,
-        salt="b" * 32,
-        display_prefix="sk-gate-abc...",
-        scopes=["chat.completions"],
-        rate_limit_rpm=60,
-        is_active=True,
-        expires_at=datetime.now() + timedelta(days=30),
+@pytest.fixture(autouse=True)
+def _reset_app_status_cache():
+    """Each test starts with a cold app-status cache."""
+    invalidate_app_status_cache()
+    yield
+    invalidate_app_status_cache()
+
+
+_FAR_FUTURE = datetime(2099, 1, 1)
+
+# Shared by every test; tests only compare identity / id, never mutate it.
+_API_KEY = ApiKey(
+    id=uuid4(),
+    user_oid="owner-oid-1",
+    hashed_key="a" * 64,
+    salt="b" * 32,
+    display_prefix="sk-gate-abc...",
+    scopes=["chat.completions"],
+    rate_limit_rpm=60,
+    is_active=True,
+    expires_at=_FAR_FUTURE,
+)
+
+
+@dataclass
+class GatewayMocks:
+    verify: AsyncMock
+    settings: SimpleNamespace
+    fetch_one: AsyncMock
+
+
+# Built once; the fixture resets it per test rather than constructing a new mock.
+_VERIFY_MOCK = AsyncMock()
+
+
+@pytest.fixture(autouse=True)
+def gateway_mocks(monkeypatch) -> GatewayMocks:
+    """Stub API-key verification, settings and the Apps lookup (active app by default)."""
+    _VERIFY_MOCK.reset_mock()
+    _VERIFY_MOCK.return_value = _API_KEY
+    mocks = GatewayMocks(
+        verify=_VERIFY_MOCK,
+        settings=SimpleNamespace(GATEWAY_SHARED_SECRET="secret"),
+        fetch_one=AsyncMock(return_value={"is_active": True}),
     )
+    monkeypatch.setattr("app.middleware.gateway.verify_and_get_api_key_with_cache", mocks.verify)
+    monkeypatch.setattr("app.middleware.gateway.get_settings", lambda: mocks.settings)
+    monkeypatch.setattr("app.middleware.gateway.db.fetch_one", mocks.fetch_one)
+    return mocks
+
+
+_NO_BODY_EXC = Exception("No body")
+
+
+async def _no_body():
+    """Stand-in for ``request.json()`` on requests without a body."""
+    raise _NO_BODY_EXC
 
 
 def _make_request(
@@ -44,288 +95,200 @@ def _make_request(
     method: str = "POST",
 ):
     """Build a mock request with the specified headers, query params and body."""
-    headers = {}
-    if bearer_token:
-        headers["Authorization"] = f"Bearer {bearer_token}"
-    if user_oid:
-        headers["X-User-Oid"] = user_oid
-    if app_id:
-        headers["X-App-Id"] = app_id
-    if gateway_secret:
-        headers["X-Gateway-Secret"] = gateway_secret
+    headers = {
+        name: value
+        for name, value in (
+            ("Authorization", f"Bearer {bearer_token}" if bearer_token else None),
+            ("X-User-Oid", user_oid),
+            ("X-App-Id", app_id),
+            ("X-Gateway-Secret", gateway_secret),
+        )
+        if value
+    }
 
     # Build query_params dict (mimics Starlette QueryParams)
-    query_params: dict[str, str] = {}
-    if query_user_oid:
-        query_params["x_user_oid"] = query_user_oid
-    if query_app_id:
-        query_params["x_app_id"] = query_app_id
-
-    request = MagicMock()
-    request.headers = headers
-    request.query_params = query_params
-    request.method = method
-    request.client = MagicMock()
-    request.client.host = "127.0.0.1"
+    query_params: dict[str, str] = {
+        name: value
+        for name, value in (("x_user_oid", query_user_oid), ("x_app_id", query_app_id))
+        if value
+    }
 
     # Mock async request.json()
-    if body is not None:
-        request.json = AsyncMock(return_value=body)
-    else:
-        request.json = AsyncMock(side_effect=Exception("No body"))
-
-    return request
+    json_mock = _no_body if body is None else AsyncMock(return_value=body)
+
+    # Only the attributes _authenticate reads; headers come solely from
+    # the raw ASGI scope, so there is deliberately no ``.headers``.
+    return SimpleNamespace(
+        scope={
+            "headers": [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in headers.items()
+            ]
+        },
+        query_params=query_params,
+        method=method,
+        client=SimpleNamespace(host="127.0.0.1"),
+        json=json_mock,
+    )
 
 
-@pytest.mark.asyncio
 async def test_api_key_only_bills_owner():
     """API key without delegation headers → bill to API key owner."""
-    api_key = _make_api_key(user_oid="owner-oid-1")
-
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            request = _make_request(bearer_token="sk-gate-test")
-            user_oid, key_id, key_obj, app_id = await _authenticate(request)
+    request = _make_request(bearer_token="sk-gate-test")
+    user_oid, key_id, key_obj, app_id = await _authenticate(request)
 
     assert user_oid == "owner-oid-1"
-    assert key_obj is api_key
+    assert key_obj is _API_KEY
     assert app_id is None
 
 
-@pytest.mark.asyncio
 async def test_delegated_billing_both_headers():
     """API key + X-User-Oid + X-App-Id → bill to delegated user."""
-    api_key = _make_api_key(user_oid="owner-oid-1")
-
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            with patch("app.middleware.gateway.db.fetch_one", new_callable=AsyncMock) as mock_fetch:
-                # Return active app
-                mock_fetch.return_value = {"is_active": True}
-                request = _make_request(
-                    bearer_token="sk-gate-test",
-                    user_oid="delegated-user-1",
-                    app_id="dify-app-1",
-                )
-                user_oid, key_id, key_obj, app_id = await _authenticate(request)
+    request = _make_request(
+        bearer_token="sk-gate-test",
+        user_oid="delegated-user-1",
+        app_id="dify-app-1",
+    )
+    user_oid, key_id, key_obj, app_id = await _authenticate(request)
 
     assert user_oid == "delegated-user-1"  # Delegated, not owner
-    assert key_obj is api_key  # API key still returned for rate limiting
+    assert key_obj is _API_KEY  # API key still returned for rate limiting
     assert app_id == "dify-app-1"
-    assert key_id == str(api_key.id)
-
-
-@pytest.mark.asyncio
-async def test_delegated_billing_missing_app_id():
-    """API key + X-User-Oid only (no X-App-Id) → 401."""
-    api_key = _make_api_key()
-
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            request = _make_request(
-                bearer_token="sk-gate-test",
-                user_oid="delegated-user-1",
-                # no app_id
-            )
-            with pytest.raises(HTTPException) as exc_info:
-                await _authenticate(request)
+    assert key_id == str(_API_KEY.id)
+
+
+_MSGS = [{"role": "user", "content": "hi"}]
+
+
+@pytest.mark.parametrize(
+    "kwargs,missing",
+    [
+        ({"user_oid": "delegated-user-1"}, "app"),
+        ({"app_id": "dify-app-1"}, "user"),
+        ({"query_user_oid": "dify-user-1"}, "app"),
+        ({"query_app_id": "dify-app-1"}, "user"),
+        ({"body": {"model": "test-model", "messages": _MSGS, "x_user_oid": "body-user-1"}}, "app"),
+        ({"body": {"model": "test-model", "messages": _MSGS, "x_app_id": "body-app-1"}}, "user"),
+    ],
+    ids=[
+        "header-user-only", "header-app-only",
+        "query-user-only", "query-app-only",
+        "body-user-only", "body-app-only",
+    ],
+)
+async def test_delegation_missing_user_or_app(kwargs, missing):
+    """Only one of user / app supplied (header, query or body) → 401 naming the missing one."""
+    request = _make_request(bearer_token="sk-gate-test", **kwargs)
+    with pytest.raises(HTTPException) as exc_info:
+        await _authenticate(request)
 
     assert exc_info.value.status_code == 401
-    assert "app" in exc_info.value.detail.lower()
+    assert missing in exc_info.value.detail.lower()
 
 
-@pytest.mark.asyncio
-async def test_delegated_billing_missing_user_oid():
-    """API key + X-App-Id only (no X-User-Oid) → 401."""
-    api_key = _make_api_key()
+async def test_app_status_is_cached_between_requests(gateway_mocks):
+    """A warm app skips the Apps lookup until its cache entry is invalidated."""
+    for _ in range(2):
+        request = _make_request(user_oid="delegated-user-1", app_id="dify-app-1")
+        await _authenticate(request)
+    assert gateway_mocks.fetch_one.await_count == 1
 
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            request = _make_request(
-                bearer_token="sk-gate-test",
-                app_id="dify-app-1",
-                # no user_oid
-            )
-            with pytest.raises(HTTPException) as exc_info:
-                await _authenticate(request)
+    invalidate_app_status_cache("dify-app-1")
+    gateway_mocks.fetch_one.return_value = {"is_active": False}
+    request = _make_request(user_oid="delegated-user-1", app_id="dify-app-1")
+    with pytest.raises(HTTPException) as exc_info:
+        await _authenticate(request)
 
-    assert exc_info.value.status_code == 401
-    assert "user" in exc_info.value.detail.lower()
+    assert gateway_mocks.fetch_one.await_count == 2
+    assert exc_info.value.status_code == 403
 
 
 # ── Query parameter delegation tests ─────────────────────────────
 
 
-@pytest.mark.asyncio
 async def test_delegated_billing_query_params():
     """API key + query x_user_oid + x_app_id → delegated billing."""
-    api_key = _make_api_key(user_oid="owner-oid-1")
-
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            with patch("app.middleware.gateway.db.fetch_one", new_callable=AsyncMock) as mock_fetch:
-                mock_fetch.return_value = {"is_active": True}
-                request = _make_request(
-                    bearer_token="sk-gate-test",
-                    query_user_oid="dify-user-1",
-                    query_app_id="dify-app-1",
-                )
-                user_oid, key_id, key_obj, app_id = await _authenticate(request)
+    request = _make_request(
+        bearer_token="sk-gate-test",
+        query_user_oid="dify-user-1",
+        query_app_id="dify-app-1",
+    )
+    user_oid, key_id, key_obj, app_id = await _authenticate(request)
 
     assert user_oid == "dify-user-1"
-    assert key_obj is api_key
+    assert key_obj is _API_KEY
     assert app_id == "dify-app-1"
-    assert key_id == str(api_key.id)
+    assert key_id == str(_API_KEY.id)
 
 
-@pytest.mark.asyncio
 async def test_query_params_take_precedence_over_headers():
     """Query params override X-User-Oid / X-App-Id headers."""
-    api_key = _make_api_key(user_oid="owner-oid-1")
-
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            with patch("app.middleware.gateway.db.fetch_one", new_callable=AsyncMock) as mock_fetch:
-                mock_fetch.return_value = {"is_active": True}
-                request = _make_request(
-                    bearer_token="sk-gate-test",
-                    user_oid="header-user",
-                    app_id="header-app",
-                    query_user_oid="query-user",
-                    query_app_id="query-app",
-                )
-                user_oid, key_id, key_obj, app_id = await _authenticate(request)
+    request = _make_request(
+        bearer_token="sk-gate-test",
+        user_oid="header-user",
+        app_id="header-app",
+        query_user_oid="query-user",
+        query_app_id="query-app",
+    )
+    user_oid, key_id, key_obj, app_id = await _authenticate(request)
 
     assert user_oid == "query-user"  # Query takes precedence
     assert app_id == "query-app"     # Query takes precedence
 
 
-@pytest.mark.asyncio
-async def test_query_param_user_only_missing_app():
-    """Query x_user_oid only (no x_app_id or header) → 401."""
-    api_key = _make_api_key()
-
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            request = _make_request(
-                bearer_token="sk-gate-test",
-                query_user_oid="dify-user-1",
-                # no app_id anywhere
-            )
-            with pytest.raises(HTTPException) as exc_info:
-                await _authenticate(request)
-
-    assert exc_info.value.status_code == 401
-    assert "app" in exc_info.value.detail.lower()
-
-
-@pytest.mark.asyncio
-async def test_query_param_app_only_missing_user():
-    """Query x_app_id only (no x_user_oid or header) → 401."""
-    api_key = _make_api_key()
-
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            request = _make_request(
-                bearer_token="sk-gate-test",
-                query_app_id="dify-app-1",
-                # no user_oid anywhere
-            )
-            with pytest.raises(HTTPException) as exc_info:
-                await _authenticate(request)
-
-    assert exc_info.value.status_code == 401
-    assert "user" in exc_info.value.detail.lower()
-
-
-@pytest.mark.asyncio
-async def test_query_param_app_not_found():
+async def test_query_param_app_not_found(gateway_mocks):
     """Query params with non-existent app → 401."""
-    api_key = _make_api_key()
-
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            with patch("app.middleware.gateway.db.fetch_one", new_callable=AsyncMock, return_value=None):
-                request = _make_request(
-                    bearer_token="sk-gate-test",
-                    query_user_oid="dify-user-1",
-                    query_app_id="nonexistent-app",
-                )
-                with pytest.raises(HTTPException) as exc_info:
-                    await _authenticate(request)
+    gateway_mocks.fetch_one.return_value = None
+    request = _make_request(
+        bearer_token="sk-gate-test",
+        query_user_oid="dify-user-1",
+        query_app_id="nonexistent-app",
+    )
+    with pytest.raises(HTTPException) as exc_info:
+        await _authenticate(request)
 
     assert exc_info.value.status_code == 401
     assert "Invalid App ID" in exc_info.value.detail
 
 
-@pytest.mark.asyncio
 async def test_header_fallback_when_no_query_params():
     """Headers are used when query params are absent (backward compat)."""
-    api_key = _make_api_key(user_oid="owner-oid-1")
-
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            with patch("app.middleware.gateway.db.fetch_one", new_callable=AsyncMock) as mock_fetch:
-                mock_fetch.return_value = {"is_active": True}
-                request = _make_request(
-                    bearer_token="sk-gate-test",
-                    user_oid="header-user",
-                    app_id="header-app",
-                )
-                user_oid, key_id, key_obj, app_id = await _authenticate(request)
+    request = _make_request(
+        bearer_token="sk-gate-test",
+        user_oid="header-user",
+        app_id="header-app",
+    )
+    user_oid, key_id, key_obj, app_id = await _authenticate(request)
 
     assert user_oid == "header-user"
     assert app_id == "header-app"
 
 
-@pytest.mark.asyncio
-async def test_delegated_billing_app_not_found():
+async def test_delegated_billing_app_not_found(gateway_mocks):
     """API key + both headers but app doesn't exist → 401."""
-    api_key = _make_api_key()
-
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            with patch("app.middleware.gateway.db.fetch_one", new_callable=AsyncMock, return_value=None):
-                request = _make_request(
-                    bearer_token="sk-gate-test",
-                    user_oid="delegated-user-1",
-                    app_id="nonexistent-app",
-                )
-                with pytest.raises(HTTPException) as exc_info:
-                    await _authenticate(request)
+    gateway_mocks.fetch_one.return_value = None
+    request = _make_request(
+        bearer_token="sk-gate-test",
+        user_oid="delegated-user-1",
+        app_id="nonexistent-app",
+    )
+    with pytest.raises(HTTPException) as exc_info:
+        await _authenticate(request)
 
     assert exc_info.value.status_code == 401
     assert "Invalid App ID" in exc_info.value.detail
 
 
-@pytest.mark.asyncio
-async def test_delegated_billing_app_disabled():
+async def test_delegated_billing_app_disabled(gateway_mocks):
     """API key + both headers but app is inactive → 403."""
-    api_key = _make_api_key()
-
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            with patch("app.middleware.gateway.db.fetch_one", new_callable=AsyncMock) as mock_fetch:
-                mock_fetch.return_value = {"is_active": False}
-                request = _make_request(
-                    bearer_token="sk-gate-test",
-                    user_oid="delegated-user-1",
-                    app_id="disabled-app",
-                )
-                with pytest.raises(HTTPException) as exc_info:
-                    await _authenticate(request)
+    gateway_mocks.fetch_one.return_value = {"is_active": False}
+    request = _make_request(
+        bearer_token="sk-gate-test",
+        user_oid="delegated-user-1",
+        app_id="disabled-app",
+    )
+    with pytest.raises(HTTPException) as exc_info:
+        await _authenticate(request)
 
     assert exc_info.value.status_code == 403
     assert "App is disabled" in exc_info.value.detail
@@ -334,10 +297,8 @@ async def test_delegated_billing_app_disabled():
 # ── Request body delegation tests ────────────────────────────────
 
 
-@pytest.mark.asyncio
 async def test_delegated_billing_body_params():
     """API key + body x_user_oid + x_app_id → delegated billing."""
-    api_key = _make_api_key(user_oid="owner-oid-1")
     body = {
         "model": "test-model",
         "messages": [{"role": "user", "content": "hi"}],
@@ -345,27 +306,20 @@ async def test_delegated_billing_body_params():
         "x_app_id": "body-app-1",
     }
 
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            with patch("app.middleware.gateway.db.fetch_one", new_callable=AsyncMock) as mock_fetch:
-                mock_fetch.return_value = {"is_active": True}
-                request = _make_request(
-                    bearer_token="sk-gate-test",
-                    body=body,
-                )
-                user_oid, key_id, key_obj, app_id = await _authenticate(request)
+    request = _make_request(
+        bearer_token="sk-gate-test",
+        body=body,
+    )
+    user_oid, key_id, key_obj, app_id = await _authenticate(request)
 
     assert user_oid == "body-user-1"
-    assert key_obj is api_key
+    assert key_obj is _API_KEY
     assert app_id == "body-app-1"
-    assert key_id == str(api_key.id)
+    assert key_id == str(_API_KEY.id)
 
 
-@pytest.mark.asyncio
 async def test_body_params_take_precedence_over_headers():
     """Body x_user_oid/x_app_id override X-User-Oid/X-App-Id headers."""
-    api_key = _make_api_key(user_oid="owner-oid-1")
     body = {
         "model": "test-model",
         "messages": [{"role": "user", "content": "hi"}],
@@ -373,27 +327,20 @@ async def test_body_params_take_precedence_over_headers():
         "x_app_id": "body-app",
     }
 
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            with patch("app.middleware.gateway.db.fetch_one", new_callable=AsyncMock) as mock_fetch:
-                mock_fetch.return_value = {"is_active": True}
-                request = _make_request(
-                    bearer_token="sk-gate-test",
-                    user_oid="header-user",
-                    app_id="header-app",
-                    body=body,
-                )
-                user_oid, key_id, key_obj, app_id = await _authenticate(request)
+    request = _make_request(
+        bearer_token="sk-gate-test",
+        user_oid="header-user",
+        app_id="header-app",
+        body=body,
+    )
+    user_oid, key_id, key_obj, app_id = await _authenticate(request)
 
     assert user_oid == "body-user"  # Body takes precedence over headers
     assert app_id == "body-app"
 
 
-@pytest.mark.asyncio
 async def test_query_params_take_precedence_over_body():
     """URL query params override request body fields."""
-    api_key = _make_api_key(user_oid="owner-oid-1")
     body = {
         "model": "test-model",
         "messages": [{"role": "user", "content": "hi"}],
@@ -401,75 +348,20 @@ async def test_query_params_take_precedence_over_body():
         "x_app_id": "body-app",
     }
 
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            with patch("app.middleware.gateway.db.fetch_one", new_callable=AsyncMock) as mock_fetch:
-                mock_fetch.return_value = {"is_active": True}
-                request = _make_request(
-                    bearer_token="sk-gate-test",
-                    query_user_oid="query-user",
-                    query_app_id="query-app",
-                    body=body,
-                )
-                user_oid, key_id, key_obj, app_id = await _authenticate(request)
+    request = _make_request(
+        bearer_token="sk-gate-test",
+        query_user_oid="query-user",
+        query_app_id="query-app",
+        body=body,
+    )
+    user_oid, key_id, key_obj, app_id = await _authenticate(request)
 
     assert user_oid == "query-user"  # Query > Body
     assert app_id == "query-app"
 
 
-@pytest.mark.asyncio
-async def test_body_user_only_missing_app():
-    """Body x_user_oid only (no x_app_id) → 401."""
-    api_key = _make_api_key()
-    body = {
-        "model": "test-model",
-        "messages": [{"role": "user", "content": "hi"}],
-        "x_user_oid": "body-user-1",
-    }
-
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            request = _make_request(
-                bearer_token="sk-gate-test",
-                body=body,
-            )
-            with pytest.raises(HTTPException) as exc_info:
-                await _authenticate(request)
-
-    assert exc_info.value.status_code == 401
-    assert "app" in exc_info.value.detail.lower()
-
-
-@pytest.mark.asyncio
-async def test_body_app_only_missing_user():
-    """Body x_app_id only (no x_user_oid) → 401."""
-    api_key = _make_api_key()
-    body = {
-        "model": "test-model",
-        "messages": [{"role": "user", "content": "hi"}],
-        "x_app_id": "body-app-1",
-    }
-
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            request = _make_request(
-                bearer_token="sk-gate-test",
-                body=body,
-            )
-            with pytest.raises(HTTPException) as exc_info:
-                await _authenticate(request)
-
-    assert exc_info.value.status_code == 401
-    assert "user" in exc_info.value.detail.lower()
-
-
-@pytest.mark.asyncio
-async def test_body_app_not_found():
+async def test_body_app_not_found(gateway_mocks):
     """Body params with non-existent app → 401."""
-    api_key = _make_api_key()
     body = {
         "model": "test-model",
         "messages": [{"role": "user", "content": "hi"}],
@@ -477,60 +369,44 @@ async def test_body_app_not_found():
         "x_app_id": "nonexistent-app",
     }
 
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            with patch("app.middleware.gateway.db.fetch_one", new_callable=AsyncMock, return_value=None):
-                request = _make_request(
-                    bearer_token="sk-gate-test",
-                    body=body,
-                )
-                with pytest.raises(HTTPException) as exc_info:
-                    await _authenticate(request)
+    gateway_mocks.fetch_one.return_value = None
+    request = _make_request(
+        bearer_token="sk-gate-test",
+        body=body,
+    )
+    with pytest.raises(HTTPException) as exc_info:
+        await _authenticate(request)
 
     assert exc_info.value.status_code == 401
     assert "Invalid App ID" in exc_info.value.detail
 
 
-@pytest.mark.asyncio
 async def test_no_body_falls_back_to_headers():
     """GET request (no body) falls back to headers."""
-    api_key = _make_api_key(user_oid="owner-oid-1")
-
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            with patch("app.middleware.gateway.db.fetch_one", new_callable=AsyncMock) as mock_fetch:
-                mock_fetch.return_value = {"is_active": True}
-                request = _make_request(
-                    bearer_token="sk-gate-test",
-                    user_oid="header-user",
-                    app_id="header-app",
-                    method="GET",
-                )
-                user_oid, key_id, key_obj, app_id = await _authenticate(request)
+    request = _make_request(
+        bearer_token="sk-gate-test",
+        user_oid="header-user",
+        app_id="header-app",
+        method="GET",
+    )
+    user_oid, key_id, key_obj, app_id = await _authenticate(request)
 
     assert user_oid == "header-user"
     assert app_id == "header-app"
 
 
-@pytest.mark.asyncio
 async def test_body_without_delegation_fields_bills_owner():
     """POST body with model/messages but no x_user_oid/x_app_id → bill owner."""
-    api_key = _make_api_key(user_oid="owner-oid-1")
     body = {
         "model": "test-model",
         "messages": [{"role": "user", "content": "hi"}],
     }
 
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            request = _make_request(
-                bearer_token="sk-gate-test",
-                body=body,
-            )
-            user_oid, key_id, key_obj, app_id = await _authenticate(request)
+    request = _make_request(
+        bearer_token="sk-gate-test",
+        body=body,
+    )
+    user_oid, key_id, key_obj, app_id = await _authenticate(request)
 
     assert user_oid == "owner-oid-1"
     assert app_id is None
@@ -539,14 +415,26 @@ async def test_body_without_delegation_fields_bills_owner():
 # ── Message content delegation tests (Dify LLM node) ─────────────
 
 
+# Serialized once at import; tests only rebuild the (cheap) message dicts.
+_DELEG_JSON = json.dumps({"x_user_oid": "user-1", "x_app_id": "app-1", "message": "hello"})
+_SYSTEM_DELEG_JSON = json.dumps({"x_user_oid": "u", "x_app_id": "a", "message": "sys"})
+_NON_DELEG_JSON = json.dumps({"foo": "bar"})
+_NO_MESSAGE_JSON = json.dumps({"x_user_oid": "u", "x_app_id": "a"})
+_FIRST_DELEG_JSON = json.dumps({"x_user_oid": "first", "x_app_id": "a1", "message": "m1"})
+_SECOND_DELEG_JSON = json.dumps({"x_user_oid": "second", "x_app_id": "a2", "message": "m2"})
+_LIST_DELEG_JSON = json.dumps(
+    {"x_user_oid": "list-user", "x_app_id": "list-app", "message": "hello from list"}
+)
+_VISION_DELEG_JSON = json.dumps(
+    {"x_user_oid": "vision-user", "x_app_id": "vision-app", "message": "describe this"}
+)
+
+
 class TestExtractDelegationFromMessages:
     """Unit tests for _extract_delegation_from_messages helper."""
-
     def test_valid_json_in_user_message(self):
         messages = [
-            {"role": "user", "content": json.dumps({
-                "x_user_oid": "user-1", "x_app_id": "app-1", "message": "hello"
-            })}
+            {"role": "user", "content": _DELEG_JSON}
         ]
         uid, aid = _extract_delegation_from_messages(messages)
         assert uid == "user-1"
@@ -555,9 +443,7 @@ class TestExtractDelegationFromMessages:
 
     def test_skips_non_user_roles(self):
         messages = [
-            {"role": "system", "content": json.dumps({
-                "x_user_oid": "u", "x_app_id": "a", "message": "sys"
-            })},
+            {"role": "system", "content": _SYSTEM_DELEG_JSON},
             {"role": "user", "content": "plain text"},
         ]
         uid, aid = _extract_delegation_from_messages(messages)
@@ -571,16 +457,14 @@ class TestExtractDelegationFromMessages:
         assert aid is None
 
     def test_json_without_delegation_keys_ignored(self):
-        messages = [{"role": "user", "content": json.dumps({"foo": "bar"})}]
+        messages = [{"role": "user", "content": _NON_DELEG_JSON}]
         uid, aid = _extract_delegation_from_messages(messages)
         assert uid is None
         assert aid is None
-        assert messages[0]["content"] == json.dumps({"foo": "bar"})  # untouched
+        assert messages[0]["content"] == _NON_DELEG_JSON  # untouched
 
     def test_missing_message_field_defaults_to_empty(self):
-        messages = [{"role": "user", "content": json.dumps({
-            "x_user_oid": "u", "x_app_id": "a"
-        })}]
+        messages = [{"role": "user", "content": _NO_MESSAGE_JSON}]
         uid, aid = _extract_delegation_from_messages(messages)
         assert uid == "u"
         assert aid == "a"
@@ -588,12 +472,8 @@ class TestExtractDelegationFromMessages:
 
     def test_uses_first_matching_message(self):
         messages = [
-            {"role": "user", "content": json.dumps({
-                "x_user_oid": "first", "x_app_id": "a1", "message": "m1"
-            })},
-            {"role": "user", "content": json.dumps({
-                "x_user_oid": "second", "x_app_id": "a2", "message": "m2"
-            })},
+            {"role": "user", "content": _FIRST_DELEG_JSON},
+            {"role": "user", "content": _SECOND_DELEG_JSON},
         ]
         uid, aid = _extract_delegation_from_messages(messages)
         assert uid == "first"
@@ -655,9 +535,7 @@ class TestExtractDelegationFromMessages:
     def test_multimodal_content_list_with_delegation_json(self):
         """content that is a list with delegation JSON text part → extracted."""
         messages = [{"role": "user", "content": [
-            {"type": "text", "text": json.dumps({
-                "x_user_oid": "list-user", "x_app_id": "list-app", "message": "hello from list"
-            })}
+            {"type": "text", "text": _LIST_DELEG_JSON}
         ]}]
         uid, aid = _extract_delegation_from_messages(messages)
         assert uid == "list-user"
@@ -676,9 +554,7 @@ class TestExtractDelegationFromMessages:
         """content list with image + delegation text → delegation extracted from text part."""
         messages = [{"role": "user", "content": [
             {"type": "image_url", "image_url": {"url": "https://example.com/img.png"}},
-            {"type": "text", "text": json.dumps({
-                "x_user_oid": "vision-user", "x_app_id": "vision-app", "message": "describe this"
-            })}
+            {"type": "text", "text": _VISION_DELEG_JSON}
         ]}]
         uid, aid = _extract_delegation_from_messages(messages)
         assert uid == "vision-user"
@@ -689,10 +565,8 @@ class TestExtractDelegationFromMessages:
         assert messages[0]["content"][0]["type"] == "image_url"
 
 
-@pytest.mark.asyncio
 async def test_message_content_delegation_e2e():
     """API key + delegation JSON inside message content → delegated billing + cleaned message."""
-    api_key = _make_api_key(user_oid="owner-oid-1")
     body = {
         "model": "test-model",
         "messages": [
@@ -705,28 +579,21 @@ async def test_message_content_delegation_e2e():
         ],
     }
 
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            with patch("app.middleware.gateway.db.fetch_one", new_callable=AsyncMock) as mock_fetch:
-                mock_fetch.return_value = {"is_active": True}
-                request = _make_request(
-                    bearer_token="sk-gate-test",
-                    body=body,
-                )
-                user_oid, key_id, key_obj, app_id = await _authenticate(request)
+    request = _make_request(
+        bearer_token="sk-gate-test",
+        body=body,
+    )
+    user_oid, key_id, key_obj, app_id = await _authenticate(request)
 
     assert user_oid == "dify-user-1"
     assert app_id == "dify-app-1"
-    assert key_obj is api_key
+    assert key_obj is _API_KEY
     # Message content should be cleaned
     assert body["messages"][1]["content"] == "こんにちは"
 
 
-@pytest.mark.asyncio
 async def test_top_level_body_takes_precedence_over_message_content():
     """Top-level body x_user_oid/x_app_id wins over message content JSON."""
-    api_key = _make_api_key(user_oid="owner-oid-1")
     body = {
         "model": "test-model",
         "messages": [
@@ -740,25 +607,18 @@ async def test_top_level_body_takes_precedence_over_message_content():
         "x_app_id": "body-app",
     }
 
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            with patch("app.middleware.gateway.db.fetch_one", new_callable=AsyncMock) as mock_fetch:
-                mock_fetch.return_value = {"is_active": True}
-                request = _make_request(
-                    bearer_token="sk-gate-test",
-                    body=body,
-                )
-                user_oid, key_id, key_obj, app_id = await _authenticate(request)
+    request = _make_request(
+        bearer_token="sk-gate-test",
+        body=body,
+    )
+    user_oid, key_id, key_obj, app_id = await _authenticate(request)
 
     assert user_oid == "body-user"  # Top-level wins
     assert app_id == "body-app"
 
 
-@pytest.mark.asyncio
-async def test_message_content_delegation_app_not_found():
+async def test_message_content_delegation_app_not_found(gateway_mocks):
     """Delegation via message content with non-existent app → 401."""
-    api_key = _make_api_key()
     body = {
         "model": "test-model",
         "messages": [
@@ -768,16 +628,13 @@ async def test_message_content_delegation_app_not_found():
         ],
     }
 
-    with patch("app.middleware.gateway.verify_and_get_api_key_with_cache", new_callable=AsyncMock, return_value=api_key):
-        with patch("app.middleware.gateway.get_settings") as mock_settings:
-            mock_settings.return_value.GATEWAY_SHARED_SECRET = "secret"
-            with patch("app.middleware.gateway.db.fetch_one", new_callable=AsyncMock, return_value=None):
-                request = _make_request(
-                    bearer_token="sk-gate-test",
-                    body=body,
-                )
-                with pytest.raises(HTTPException) as exc_info:
-                    await _authenticate(request)
+    gateway_mocks.fetch_one.return_value = None
+    request = _make_request(
+        bearer_token="sk-gate-test",
+        body=body,
+    )
+    with pytest.raises(HTTPException) as exc_info:
+        await _authenticate(request)
 
     assert exc_info.value.status_code == 401
     assert "Invalid App ID" in exc_info.value.detail
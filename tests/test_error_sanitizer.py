@@ -2,6 +2,8 @@
 Unit tests for error sanitization.
 """
 
+import pytest
+
 from app.services.error_sanitizer import (
     classify_and_sanitize_error,
     sanitize_error_message,
@@ -50,40 +52,28 @@ class TestSanitizeErrorMessage:
 
 
 class TestClassifyAndSanitizeError:
-    def test_oom_error(self):
-        code, msg = classify_and_sanitize_error(
-            RuntimeError("CUDA out of memory")
-        )
-        assert code == "oom_error"
+    @pytest.mark.parametrize(
+        "error,expected_code",
+        [
+            (RuntimeError("CUDA out of memory"), "oom_error"),
+            (TimeoutError("Request timeout after 120s"), "timeout"),
+            (Exception("Rate limit exceeded"), "rate_limit"),
+            (Exception("GPU memory allocation failed"), "gpu_error"),
+            (Exception("Model not found: llama-70b"), "model_not_loaded"),
+            (Exception("Error in /app/internal/handler.py: DB password=secret123"), "provider_error"),
+        ],
+        ids=["oom", "timeout", "rate_limit", "gpu", "model_not_found", "generic"],
+    )
+    def test_classifies_error(self, error, expected_code):
+        code, _ = classify_and_sanitize_error(error)
+        assert code == expected_code
+
+    def test_oom_message_mentions_memory(self):
+        _, msg = classify_and_sanitize_error(RuntimeError("CUDA out of memory"))
         assert "memory" in msg.lower()
 
-    def test_timeout_error(self):
-        code, msg = classify_and_sanitize_error(
-            TimeoutError("Request timeout after 120s")
-        )
-        assert code == "timeout"
-
-    def test_rate_limit_error(self):
-        code, msg = classify_and_sanitize_error(
-            Exception("Rate limit exceeded")
-        )
-        assert code == "rate_limit"
-
-    def test_gpu_error(self):
-        code, msg = classify_and_sanitize_error(
-            Exception("GPU memory allocation failed")
-        )
-        assert code == "gpu_error"
-
-    def test_model_not_found(self):
-        code, msg = classify_and_sanitize_error(
-            Exception("Model not found: llama-70b")
-        )
-        assert code == "model_not_loaded"
-
     def test_generic_error_sanitized(self):
-        code, msg = classify_and_sanitize_error(
+        _, msg = classify_and_sanitize_error(
             Exception("Error in /app/internal/handler.py: DB password=secret123")
         )
-        assert code == "provider_error"
         assert "/app/internal" not in msg
@@ -0,0 +1,51 @@
+"""
+Unit tests for the gateway's batched model lookup (_ModelLoader).
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from app.middleware.gateway import _ModelLoader
+
+
+async def test_concurrent_model_lookups_share_one_query():
+    loader = _ModelLoader()
+    with patch("app.middleware.gateway.db.fetch_all", new_callable=AsyncMock) as mock_fetch_all:
+        mock_fetch_all.return_value = [{"id": "gpt-4"}]
+
+        rows = await asyncio.gather(
+            loader.load("gpt-4"), loader.load("gpt-4"), loader.load("missing")
+        )
+
+    assert rows == [{"id": "gpt-4"}, {"id": "gpt-4"}, None]
+    mock_fetch_all.assert_awaited_once()
+    assert sorted(mock_fetch_all.call_args[0][1]) == ["gpt-4", "missing"]
+
+
+async def test_failed_batch_query_reaches_every_waiter():
+    loader = _ModelLoader()
+    with patch(
+        "app.middleware.gateway.db.fetch_all",
+        new_callable=AsyncMock,
+        side_effect=ConnectionError("db down"),
+    ):
+        results = await asyncio.wait_for(
+            asyncio.gather(
+                loader.load("gpt-4"),
+                loader.load("gpt-4"),
+                loader.load("other"),
+                return_exceptions=True,
+            ),
+            timeout=1,
+        )
+
+    assert len(results) == 3
+    assert all(isinstance(r, ConnectionError) for r in results)
+
+    # The failure isn't sticky: the next batch queries again
+    with patch(
+        "app.middleware.gateway.db.fetch_all",
+        new_callable=AsyncMock,
+        return_value=[{"id": "gpt-4"}],
+    ):
+        assert await loader.load("gpt-4") == {"id": "gpt-4"}